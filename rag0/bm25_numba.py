@@ -0,0 +1,74 @@
+"""
+Numba kernel for BM25 top-k retrieval over a bm25s index (optional: requires numba)
+Scores are accumulated from the precomputed term -> document postings and the top-k
+is extracted with a bounded min-heap, in one compiled call per query.
+"""
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+from numba import njit
+
+
+_NO_MASK = np.zeros(1, dtype=np.bool_)  # Argument factice : numba type les tableaux, pas None
+
+
+# Séquentiel (pas de parallel=True) : appelé depuis plusieurs threads du serveur, ce que les couches de
+# threading de numba ne supportent pas (blocage à la sortie avec TBB, abandon avec workqueue)
+@njit(cache=True, nogil=True)  # GIL relâché : la boucle asyncio du serveur continue
+def score_and_topk(indptr, indices, data, term_ids, term_weights, k, scores, mask, has_mask):
+    """Accumulate the postings of term_ids into scores, then return the k best (doc ids, scores) among mask"""
+    n_docs = scores.shape[0]
+    scores[:] = 0.0
+
+    for t in range(term_ids.shape[0]):
+        start, end = indptr[term_ids[t]], indptr[term_ids[t] + 1]
+        weight = term_weights[t]
+        for j in range(start, end):
+            scores[indices[j]] += data[j] * weight
+
+    # Tas min de taille k : la racine est le k-ième meilleur score courant
+    if has_mask:
+        k = min(k, np.count_nonzero(mask))
+    k = min(k, n_docs)
+    heap_scores = np.full(k, -np.inf, dtype=scores.dtype)
+    heap_idx = np.full(k, -1, dtype=np.int64)
+    for doc in range(n_docs):
+        if has_mask and not mask[doc]:
+            continue
+        score = scores[doc]
+        if k == 0 or score <= heap_scores[0]:
+            continue
+        heap_scores[0] = score
+        heap_idx[0] = doc
+        pos = 0
+        while True:
+            child = 2 * pos + 1
+            if child >= k:
+                break
+            if child + 1 < k and heap_scores[child + 1] < heap_scores[child]:
+                child += 1
+            if heap_scores[child] >= heap_scores[pos]:
+                break
+            heap_scores[pos], heap_scores[child] = heap_scores[child], heap_scores[pos]
+            heap_idx[pos], heap_idx[child] = heap_idx[child], heap_idx[pos]
+            pos = child
+
+    filled = heap_idx >= 0
+    return heap_idx[filled], heap_scores[filled]
+
+
+def bm25_top_k_numba(
+    bm25, query_tokens: List[str], k: int, mask: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Top-k BM25 documents of a bm25s index with the compiled kernel (same contract as rag_core.bm25_top_k)"""
+    term_ids, counts = np.unique(
+        np.asarray(bm25.get_tokens_ids(query_tokens), dtype=np.int64), return_counts=True
+    )
+    data = bm25.scores['data']
+    scores = np.empty(bm25.scores['num_docs'], dtype=data.dtype)
+    return score_and_topk(
+        bm25.scores['indptr'], bm25.scores['indices'], data,
+        term_ids, counts.astype(data.dtype), k, scores,
+        mask if mask is not None else _NO_MASK, mask is not None
+    )
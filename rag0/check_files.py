@@ -24,12 +24,12 @@ def check_files():
             print(f"  - {file_info['filename']}: {status} ({chunks} chunks)")
         
         # Check if chunks exist for Informatique
-        chunks = db.get_rag_chunks_by_classification(matiere="Informatique")
-        print(f"\n📄 Informatique chunks: {len(chunks)}")
+        chunk_count = db.count_rag_chunks(matiere="Informatique")
+        print(f"\n📄 Informatique chunks: {chunk_count}")
         
-        if chunks:
+        if chunk_count:
             print("Sample chunks:")
-            for chunk in chunks[:3]:
+            for chunk in db.get_rag_chunks_by_classification(matiere="Informatique", limit=3):
                 print(f"  - {chunk['chunk_id']}: {chunk['chunk_text'][:50]}...")
         else:
             print("  No chunks found - files need to be processed!")
@@ -5,30 +5,223 @@ Handles file storage, classification, and integration with RAG pipeline
 
 import hashlib
 import json
+import re
 import sqlite3
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any
-import numpy as np
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple, Any
+
+if TYPE_CHECKING:  # numpy n'est importé qu'à l'encodage/décodage des embeddings
+    import numpy as np
+
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+CLASSIFICATION_FIELDS = ('matiere', 'sous_matiere', 'enseignant', 'semestre', 'promo')
+FETCH_BATCH_SIZE = 1000  # Lignes lues par fetchmany pour borner la mémoire
+HASH_BUFFER_SIZE = 1 << 20  # 1 MiB par lecture pour le hash des fichiers
+_SLUG_RE = re.compile(r'[^a-z0-9]+')
+SCHEMA_PATH = Path(__file__).parent / "database_schema.sql"
+RETURNING_ID = "RETURNING id" if sqlite3.sqlite_version_info >= (3, 35) else ""  # RETURNING : SQLite 3.35+
+
+# Colonnes renvoyées par get_rag_chunks_by_classification : tout sauf le BLOB d'embedding
+CHUNK_COLUMNS = (
+    "c.id, c.file_id, c.chunk_id, c.chunk_text, c.page_number, c.chunk_index, c.embedding_model, "
+    "c.matiere, c.sous_matiere, c.enseignant, c.semestre, c.promo, c.created_at, "
+    "f.filename, f.doc_id, f.doc_label"
+)
+
+# Ordre des chunks dans vector_db.json / FAISS / BM25 : les nouveaux chunks s'ajoutent en fin d'index
+INDEX_ORDER = "c.id"
+
+# Colonnes ajoutées après la création des premières bases (ALTER TABLE si absentes)
+ADDED_COLUMNS = [
+    ("files", "sous_matiere", "TEXT"),
+    ("files", "status", "TEXT DEFAULT 'en attente'"),
+    ("rag_chunks", "sous_matiere", "TEXT"),
+    ("rag_chunks", "embedding_dtype", "TEXT DEFAULT 'float32'"),
+    ("rag_chunks", "tokens", "TEXT"),
+]
+
+# Index des chemins de lecture (filtres de classification, doublons, doc_id, statut).
+# Rejoués à chaque ouverture : le script de schéma s'arrête au premier
+# "already exists" sur une base existante.
+INDEX_STATEMENTS = [
+    "DROP INDEX IF EXISTS idx_files_classification",
+    "DROP INDEX IF EXISTS idx_chunks_classification",
+    "CREATE INDEX IF NOT EXISTS idx_files_classif ON files(matiere, sous_matiere, enseignant, semestre, promo, upload_date DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_files_hash ON files(file_hash)",
+    "CREATE INDEX IF NOT EXISTS idx_files_doc_id ON files(doc_id)",
+    "CREATE INDEX IF NOT EXISTS idx_files_status ON files(status)",
+    "CREATE INDEX IF NOT EXISTS idx_chunks_file_id ON rag_chunks(file_id)",
+    "CREATE INDEX IF NOT EXISTS idx_chunks_classif ON rag_chunks(matiere, sous_matiere, enseignant, semestre, promo, created_at DESC)",
+    # Colonnes les plus sélectives en tête (peu de matières, beaucoup d'enseignants)
+    "CREATE INDEX IF NOT EXISTS idx_chunks_enseignant ON rag_chunks(enseignant, sous_matiere, matiere, semestre, promo)",
+]
+
+
+# Vue de synthèse : les chunks sont comptés une fois par file_id (via idx_chunks_file_id)
+# puis joints, au lieu d'un GROUP BY sur toutes les colonnes de files.
+FILE_SUMMARY_VIEW = """CREATE VIEW file_summary AS
+SELECT f.*, COALESCE(cc.n, 0) AS actual_chunks
+FROM files f
+LEFT JOIN (
+    SELECT file_id, COUNT(*) AS n FROM rag_chunks GROUP BY file_id
+) cc ON cc.file_id = f.id"""
+
+EMBEDDING_ITEMSIZE = {'int8': 1, 'float16': 2, 'float32': 4}  # Octets par composante selon embedding_dtype
+INT8_SCALE_BYTES = 4  # BLOB int8 = échelle float32 suivie des composantes quantifiées
+
+# PRAGMA user_version : migrations de données à exécuter une seule fois
+EMBEDDING_BLOB_VERSION = 1  # embeddings JSON (texte) convertis en BLOB binaire
+EMBEDDING_UNIT_NORM_VERSION = 2  # embeddings stockés normalisés (norme L2 = 1)
+UNIT_NORM_TOLERANCE = 1e-3  # Écart de norme toléré (arrondi float16/int8) avant renormalisation
+MIGRATION_BATCH = 1000  # Lignes relues par lot pendant une migration
+
+# Tags normalisés : une ligne par (fichier, tag) pour un filtre indexé au lieu d'un LIKE sur le JSON
+FILE_TAGS_TABLE = """
+CREATE TABLE IF NOT EXISTS file_tags (
+    file_id INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (file_id, tag),
+    FOREIGN KEY (file_id) REFERENCES files (id) ON DELETE CASCADE
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_file_tags_tag ON file_tags(tag, file_id);
+"""
+
+# Index plein texte (trigrammes) des champs lus par search_files : un LIKE '%texte%' sans parcours de files.
+# Table à contenu externe (aucune copie du texte) tenue à jour par triggers ; trigram requiert SQLite >= 3.34.
+FILES_FTS_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(
+    filename, doc_label, description, content='files', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS files_fts_insert AFTER INSERT ON files BEGIN
+    INSERT INTO files_fts (rowid, filename, doc_label, description)
+    VALUES (new.id, new.filename, new.doc_label, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS files_fts_delete AFTER DELETE ON files BEGIN
+    INSERT INTO files_fts (files_fts, rowid, filename, doc_label, description)
+    VALUES ('delete', old.id, old.filename, old.doc_label, old.description);
+END;
+CREATE TRIGGER IF NOT EXISTS files_fts_update AFTER UPDATE OF filename, doc_label, description ON files BEGIN
+    INSERT INTO files_fts (files_fts, rowid, filename, doc_label, description)
+    VALUES ('delete', old.id, old.filename, old.doc_label, old.description);
+    INSERT INTO files_fts (rowid, filename, doc_label, description)
+    VALUES (new.id, new.filename, new.doc_label, new.description);
+END;
+"""
+FTS_MIN_QUERY_LENGTH = 3  # Un trigramme au moins : en dessous, search_files repasse par LIKE
+
+# Requêtes de files : {where} ne contient que les filtres fournis (col = ?), pour que idx_files_classif
+# reste utilisable ; au plus une chaîne SQL par combinaison, gardée dans le cache de requêtes de sqlite3
+SELECT_FILES_BY_CLASSIFICATION = """
+    SELECT * FROM files
+    WHERE {where}
+    ORDER BY upload_date DESC
+"""
+SEARCH_FILES = """
+    SELECT * FROM files
+    WHERE (filename LIKE ? OR doc_label LIKE ? OR description LIKE ?)
+    AND {where}
+    ORDER BY upload_date DESC
+"""
+SEARCH_FILES_FTS = """
+    SELECT * FROM files
+    WHERE id IN (SELECT rowid FROM files_fts WHERE files_fts MATCH ?)
+    AND {where}
+    ORDER BY upload_date DESC
+"""
+
+
+def _file_filters(status, matiere, sous_matiere, enseignant, semestre, promo) -> Tuple[str, List[str]]:
+    """Build the WHERE clause and params for the supplied file filters ('' counts as no filter)"""
+    conditions = []
+    params = []
+    values = (status, matiere, sous_matiere, enseignant, semestre, promo)
+    for column, value in zip(('status',) + CLASSIFICATION_FIELDS, values):
+        if value:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    return " AND ".join(conditions) if conditions else "1=1", params
+
+
+def calculate_file_hash(file_path: Path) -> str:
+    """Calculate SHA256 hash of file"""
+    with open(file_path, "rb") as f:
+        if hasattr(hashlib, "file_digest"):  # Python 3.11+ : boucle en C, GIL relâché
+            return hashlib.file_digest(f, "sha256").hexdigest()
+
+        hash_sha256 = hashlib.sha256()
+        buffer = memoryview(bytearray(HASH_BUFFER_SIZE))
+        while n := f.readinto(buffer):
+            hash_sha256.update(buffer[:n])
+    return hash_sha256.hexdigest()
+
+
+def _rows_as_dicts(cursor: sqlite3.Cursor) -> List[Dict]:
+    """Convert a result set to dicts, fetching FETCH_BATCH_SIZE rows at a time"""
+    rows = []
+    while batch := cursor.fetchmany(FETCH_BATCH_SIZE):
+        rows.extend(dict(row) for row in batch)
+    return rows
+
 
 class DatabaseManager:
-    def __init__(self, db_path: str = "rag_database.db"):
+    def __init__(
+        self,
+        db_path: str = "rag_database.db",
+        check_same_thread: bool = False,
+        journal_mode: str = "WAL",
+        synchronous: str = "NORMAL",
+        cache_size: int = -65536,  # Négatif = en KiB (64 MB)
+        mmap_size: int = 1 << 30,  # 1 GB (lectures des BLOB d'embeddings sans copie dans le cache de pages)
+        embedding_dtype: str = "float16",
+        timeout: float = 30.0  # Secondes d'attente du verrou d'écriture d'une autre connexion
+    ):
         self.db_path = Path(db_path)
+        self.check_same_thread = check_same_thread
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.cache_size = cache_size
+        self.mmap_size = mmap_size
+        self.timeout = timeout
+        self.embedding_dtype = embedding_dtype  # Précision de stockage des embeddings (BLOB) : float32, float16 ou int8
         self.connection = None
+        # (version de la base, valeurs) : voir _data_version
+        self._classif_cache: Optional[Tuple[Tuple[int, int], Dict[str, List[str]]]] = None
+        self._files_fts = False  # files_fts disponible (FTS5 + trigram)
         self._connect()
         self._create_tables()
     
     def _connect(self):
         """Establish database connection"""
-        self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        # Transactions implicites en BEGIN IMMEDIATE : le verrou d'écriture est pris dès le début
+        # (attente via busy timeout) au lieu d'échouer en SQLITE_BUSY lors de la promotion,
+        # quand file_manager et le worker d'ingestion écrivent sur deux connexions
+        self.connection = sqlite3.connect(
+            self.db_path, check_same_thread=self.check_same_thread, isolation_level="IMMEDIATE",
+            timeout=self.timeout
+        )
 
         self.connection.row_factory = sqlite3.Row  # Enable column access by name
+
+        # WAL + synchronous=NORMAL : un seul fsync au checkpoint au lieu d'un par commit,
+        # et les lectures ne sont plus bloquées par l'écriture en cours
+        self.connection.execute(f"PRAGMA journal_mode={self.journal_mode}")
+        self.connection.execute(f"PRAGMA synchronous={self.synchronous}")
+        self.connection.execute("PRAGMA temp_store=MEMORY")
+        self.connection.execute(f"PRAGMA cache_size={int(self.cache_size)}")
+        self.connection.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        self.connection.execute("PRAGMA foreign_keys=ON")
     
     def _create_tables(self):
         """Create database tables if they don't exist"""
-        schema_path = Path(__file__).parent / "database_schema.sql"
-        if schema_path.exists():
-            with open(schema_path, 'r', encoding='utf-8') as f:
+        if SCHEMA_PATH.exists():
+            with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
                 schema = f.read()
             try:
                 self.connection.executescript(schema)
@@ -39,6 +232,131 @@ class DatabaseManager:
                     pass
                 else:
                     raise
+        self._add_missing_columns()
+        self._create_indexes()
+        self._create_file_summary_view()
+        self._create_file_tags()
+        self._create_files_fts()
+        self._convert_json_embeddings()
+        self._normalize_stored_embeddings()
+
+    def _create_file_summary_view(self):
+        """(Re)create the file_summary view only when its definition changed"""
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'view' AND name = 'file_summary'")
+        row = cursor.fetchone()
+        # sqlite_master garde le texte du CREATE VIEW : s'il est à jour, pas de DDL (ni verrou d'écriture)
+        if row and row[0] == FILE_SUMMARY_VIEW:
+            return
+        self.connection.executescript(f"DROP VIEW IF EXISTS file_summary; {FILE_SUMMARY_VIEW};")
+
+    def _convert_json_embeddings(self):
+        """One-shot migration of embeddings stored as JSON text to binary BLOBs"""
+        cursor = self.connection.cursor()
+        cursor.execute("PRAGMA user_version")
+        if cursor.fetchone()[0] >= EMBEDDING_BLOB_VERSION:
+            return
+        cursor.execute("SELECT id, embedding FROM rag_chunks WHERE typeof(embedding) = 'text'")
+        updates = [
+            (encode_embedding(json.loads(embedding), self.embedding_dtype), self.embedding_dtype, chunk_id)
+            for chunk_id, embedding in cursor.fetchall()
+        ]
+        if updates:
+            cursor.executemany(
+                "UPDATE rag_chunks SET embedding = ?, embedding_dtype = ? WHERE id = ?", updates
+            )
+            print(f"[✅] {len(updates)} embeddings JSON convertis en BLOB")
+        cursor.execute(f"PRAGMA user_version = {EMBEDDING_BLOB_VERSION}")
+        self.connection.commit()
+
+    def _normalize_stored_embeddings(self):
+        """One-shot migration rescaling stored embeddings to unit norm (the FAISS build no longer normalises)"""
+        cursor = self.connection.cursor()
+        cursor.execute("PRAGMA user_version")
+        if cursor.fetchone()[0] >= EMBEDDING_UNIT_NORM_VERSION:
+            return
+        import numpy as np
+        cursor.execute("SELECT id, embedding, embedding_dtype FROM rag_chunks WHERE typeof(embedding) = 'blob'")
+        updated = 0
+        while rows := cursor.fetchmany(MIGRATION_BATCH):
+            updates = []
+            for chunk_id, blob, dtype in rows:
+                embedding = decode_embedding(blob, dtype)
+                if not np.isfinite(embedding).all():
+                    continue  # Embedding corrompu : laissé tel quel (écarté ou signalé au build)
+                if abs(float(embedding @ embedding) - 1.0) > UNIT_NORM_TOLERANCE:
+                    updates.append((encode_embedding(unit_normalize(embedding), dtype or "float32"), chunk_id))
+            if updates:
+                self.connection.executemany("UPDATE rag_chunks SET embedding = ? WHERE id = ?", updates)
+                updated += len(updates)
+        if updated:
+            print(f"[✅] {updated} embeddings renormalisés (norme L2 = 1)")
+        cursor.execute(f"PRAGMA user_version = {EMBEDDING_UNIT_NORM_VERSION}")
+        self.connection.commit()
+
+    def _create_file_tags(self):
+        """Create the file_tags table, filling it from files.tags on first creation"""
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'file_tags'")
+        is_new = cursor.fetchone() is None
+        self.connection.executescript(FILE_TAGS_TABLE)
+        if is_new:
+            cursor.execute("""
+                INSERT OR IGNORE INTO file_tags (file_id, tag)
+                SELECT files.id, json_each.value
+                FROM files, json_each(files.tags)
+                WHERE files.tags IS NOT NULL
+            """)
+            self.connection.commit()
+
+    def _create_files_fts(self):
+        """Create the files_fts trigram index, filling it from files on first creation (LIKE fallback if unsupported)"""
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'files_fts'")
+        is_new = cursor.fetchone() is None
+        try:
+            self.connection.executescript(FILES_FTS_TABLE)
+        except sqlite3.OperationalError as e:
+            print(f"[⚠️] Full-text search disabled ({e})")
+            return
+        if is_new:
+            cursor.execute("INSERT INTO files_fts (files_fts) VALUES ('rebuild')")
+            self.connection.commit()
+        self._files_fts = True
+
+    def _set_file_tags(self, file_id: int, tags: List[str]):
+        """Replace the tags of a file in file_tags (no commit)"""
+        cursor = self.connection.cursor()
+        cursor.execute("DELETE FROM file_tags WHERE file_id = ?", (file_id,))
+        cursor.executemany(
+            "INSERT OR IGNORE INTO file_tags (file_id, tag) VALUES (?, ?)",
+            [(file_id, tag) for tag in tags]
+        )
+
+    def _add_missing_columns(self):
+        """Add columns introduced after the database was created"""
+        cursor = self.connection.cursor()
+        for table, column, declaration in ADDED_COLUMNS:
+            cursor.execute(f"PRAGMA table_info({table})")
+            if column not in {info[1] for info in cursor.fetchall()}:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+        self.connection.commit()
+
+    def _create_indexes(self):
+        """Create missing indexes and refresh planner statistics when one was added"""
+        cursor = self.connection.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+        indexes_before = {row[0] for row in cursor.fetchall()}
+        for statement in INDEX_STATEMENTS:
+            try:
+                cursor.execute(statement)
+            except sqlite3.OperationalError as e:
+                # Base dans un état inattendu : on continue sans cet index
+                print(f"[⚠️] Index skipped ({e})")
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+        if not {row[0] for row in cursor.fetchall()} <= indexes_before:
+            cursor.execute("ANALYZE")
+        self.connection.commit()
     
     def add_file(
         self,
@@ -51,11 +369,18 @@ class DatabaseManager:
         doc_id: Optional[str] = None,
         doc_label: Optional[str] = None,
         description: Optional[str] = None,
-        tags: Optional[List[str]] = None
+        tags: Optional[List[str]] = None,
+        autocommit: bool = True,
+        file_hash: Optional[str] = None
     ) -> int:
         """
         Add a new file to the database with classification metadata
         
+        Args:
+            autocommit: Commit immediately; pass False when the caller wraps
+                several writes in one transaction (``with db.connection:``)
+            file_hash: SHA256 already computed by the caller (skips re-hashing)
+        
         Returns:
             int: File ID in the database
         """
@@ -64,7 +389,7 @@ class DatabaseManager:
             raise FileNotFoundError(f"File not found: {file_path}")
         
         # Generate file hash for duplicate detection
-        file_hash = self._calculate_file_hash(file_path)
+        file_hash = file_hash or self._calculate_file_hash(file_path)
         
         # Check for duplicates — reuse existing file instead of raising
         existing = self.get_file_by_hash(file_hash)
@@ -83,12 +408,13 @@ class DatabaseManager:
         status = "En attente"  # Par défaut avant traitement
 
         cursor = self.connection.cursor()
-        cursor.execute("""
+        cursor.execute(f"""
             INSERT INTO files (
                 filename, file_path, file_size, file_type,
                 matiere, sous_matiere, enseignant, semestre, promo,
                 doc_id, doc_label, description, tags, file_hash, status
             ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            {RETURNING_ID}
         """, (
             file_path.name,
             str(file_path.absolute()),
@@ -101,8 +427,11 @@ class DatabaseManager:
             status
         ))
         
-        file_id = cursor.lastrowid
-        self.connection.commit()
+        file_id = cursor.fetchone()[0] if RETURNING_ID else cursor.lastrowid
+        if tags:
+            self._set_file_tags(file_id, tags)
+        if autocommit:
+            self.connection.commit()
         return file_id
     
     def get_file_by_hash(self, file_hash: str) -> Optional[Dict]:
@@ -129,50 +458,35 @@ class DatabaseManager:
         status: Optional[str] = None
     ) -> List[Dict]:
         """Get files filtered by classification criteria"""
-        conditions = []
-        params = []
-        if status:
-            conditions.append("status = ?")
-            params.append(status)
-        if matiere:
-            conditions.append("matiere = ?")
-            params.append(matiere)
-        if sous_matiere:
-            conditions.append("sous_matiere = ?")
-            params.append(sous_matiere)
-        if enseignant:
-            conditions.append("enseignant = ?")
-            params.append(enseignant)
-        if semestre:
-            conditions.append("semestre = ?")
-            params.append(semestre)
-        if promo:
-            conditions.append("promo = ?")
-            params.append(promo)
-        
-        where_clause = " AND ".join(conditions) if conditions else "1=1"
+        where_clause, params = _file_filters(status, matiere, sous_matiere, enseignant, semestre, promo)
         
         cursor = self.connection.cursor()
-        cursor.execute(f"""
-            SELECT * FROM files 
-            WHERE {where_clause}
-            ORDER BY upload_date DESC
-        """, params)
+        cursor.execute(SELECT_FILES_BY_CLASSIFICATION.format(where=where_clause), params)
         
-        return [dict(row) for row in cursor.fetchall()]
+        return _rows_as_dicts(cursor)
     
+    def _data_version(self) -> Tuple[int, int]:
+        """Changes whenever the database is written, by this connection or another one"""
+        # data_version : commits des autres connexions (CLI, worker d'ingestion) ; total_changes : les nôtres
+        return self.connection.execute("PRAGMA data_version").fetchone()[0], self.connection.total_changes
+
     def get_unique_classifications(self) -> Dict[str, List[str]]:
-        """Get all unique values for each classification field"""
-        cursor = self.connection.cursor()
-        
-        classifications = {}
-        for field in ['matiere', 'sous_matiere', 'enseignant', 'semestre', 'promo']:
-            cursor.execute(f"SELECT DISTINCT {field} FROM files WHERE {field} IS NOT NULL ORDER BY {field}")
-            classifications[field] = [row[0] for row in cursor.fetchall()]
-        
-        return classifications
+        """Get all unique values for each classification field (cached until the next write)"""
+        version = self._data_version()
+        if self._classif_cache is None or self._classif_cache[0] != version:
+            cursor = self.connection.cursor()
+            cursor.execute(f"SELECT DISTINCT {', '.join(CLASSIFICATION_FIELDS)} FROM files")
+
+            values = {field: set() for field in CLASSIFICATION_FIELDS}
+            for row in cursor.fetchall():
+                for field, value in zip(CLASSIFICATION_FIELDS, row):
+                    if value is not None:
+                        values[field].add(value)
+            self._classif_cache = (version, {field: sorted(found) for field, found in values.items()})
+
+        return {field: list(found) for field, found in self._classif_cache[1].items()}
     
-    def mark_file_processed(self, file_id: int, chunk_count: int):
+    def mark_file_processed(self, file_id: int, chunk_count: int, autocommit: bool = True):
         """Mark file as processed and update chunk count"""
         cursor = self.connection.cursor()
         cursor.execute("""
@@ -184,9 +498,10 @@ class DatabaseManager:
                 status = 'Traite'
             WHERE id = ?
         """, (chunk_count, file_id))
-        self.connection.commit()
+        if autocommit:
+            self.connection.commit()
     
-    def add_rag_chunks(self, file_id: int, chunks: List[Dict]):
+    def add_rag_chunks(self, file_id: int, chunks: List[Dict], autocommit: bool = True):
         """
         Add RAG chunks for a file
         
@@ -195,35 +510,66 @@ class DatabaseManager:
             chunks: List of chunk dictionaries with keys:
                 - chunk_id, chunk_text, page_number, chunk_index
                 - embedding (numpy array), matiere, sous_matiere, enseignant, semestre, promo
+                - tokens (optional): BM25 tokens joined by spaces
+            autocommit: Commit immediately (see add_file)
         """
-        cursor = self.connection.cursor()
-        
+        rows = []
         for chunk in chunks:
-            # Convert numpy embedding to binary
-            embedding_blob = chunk['embedding'].tobytes() if isinstance(chunk['embedding'], np.ndarray) else chunk['embedding']
-            
-            cursor.execute("""
-                INSERT INTO rag_chunks (
-                    file_id, chunk_id, chunk_text, page_number, chunk_index,
-                    embedding, embedding_model, matiere, sous_matiere, enseignant, semestre, promo
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
+            embedding = chunk['embedding']
+            if isinstance(embedding, (bytes, bytearray)):
+                # Déjà sérialisé : on garde le BLOB tel quel
+                embedding_blob = embedding
+                embedding_dtype = chunk.get('embedding_dtype', 'float32')
+            else:
+                # Convert numpy embedding to binary (float16 par défaut : 2 octets/dimension)
+                embedding_blob = encode_embedding(embedding, self.embedding_dtype)
+                embedding_dtype = self.embedding_dtype
+            rows.append((
                 file_id,
                 chunk['chunk_id'],
                 chunk['chunk_text'],
                 chunk.get('page_number'),
                 chunk.get('chunk_index'),
                 embedding_blob,
+                embedding_dtype,
                 chunk.get('embedding_model'),
                 chunk['matiere'],
                 chunk['sous_matiere'],
                 chunk['enseignant'],
                 chunk['semestre'],
-                chunk['promo']
+                chunk['promo'],
+                chunk.get('tokens')
             ))
-        print(f"[DEBUG] Inserting {len(chunks)} chunks for file ID {file_id}") #?? A enlever comme tous les print
-        self.connection.commit()
+
+        # Une seule requête préparée et un seul commit pour tout le lot
+        self.connection.executemany("""
+            INSERT INTO rag_chunks (
+                file_id, chunk_id, chunk_text, page_number, chunk_index,
+                embedding, embedding_dtype, embedding_model,
+                matiere, sous_matiere, enseignant, semestre, promo, tokens
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        if autocommit:
+            self.connection.commit()
     
+    def add_file_bulk(self, chunks: List[Dict], **file_fields) -> int:
+        """
+        Add a file with all its chunks and mark it processed, in a single transaction
+
+        Args:
+            chunks: Chunk dictionaries (see add_rag_chunks)
+            file_fields: add_file arguments (file_path, matiere, ...)
+
+        Returns:
+            int: File ID in the database
+        """
+        # Un seul commit (et un seul fsync) pour le fichier, ses chunks et son statut
+        with self.connection:
+            file_id = self.add_file(autocommit=False, **file_fields)
+            self.add_rag_chunks(file_id, chunks, autocommit=False)
+            self.mark_file_processed(file_id, len(chunks), autocommit=False)
+        return file_id
+
     def get_rag_chunks_by_classification(
         self,
         matiere: Optional[str] = None,
@@ -231,70 +577,187 @@ class DatabaseManager:
         enseignant: Optional[str] = None,
         semestre: Optional[str] = None,
         promo: Optional[str] = None,limit: Optional[int] = None) -> List[Dict]:
-        """Get RAG chunks filtered by classification"""
-        conditions = []
-        params = []
-        if matiere:
-            conditions.append("c.matiere = ?")
-            params.append(matiere)
-        if sous_matiere:
-            conditions.append("c.sous_matiere = ?")
-            params.append(sous_matiere)
-        if enseignant:
-            conditions.append("c.enseignant = ?")
-            params.append(enseignant)
-        if semestre:
-            conditions.append("c.semestre = ?")
-            params.append(semestre)
-        if promo:
-            conditions.append("c.promo = ?")
-            params.append(promo)
-        
-        where_clause = " AND ".join(conditions) if conditions else "1=1"
-        limit_clause = f"LIMIT {limit}" if limit else ""
-        
-        params = [p for p in params if p not in (None, "", "null")]
-
+        """Get RAG chunks filtered by classification (without the embedding BLOB)"""
+        return self._select_rag_chunks(
+            CHUNK_COLUMNS, matiere, sous_matiere, enseignant, semestre, promo, limit
+        )
+    
+    def get_rag_chunks_with_embeddings(
+        self,
+        matiere: Optional[str] = None,
+        sous_matiere: Optional[str] = None,
+        enseignant: Optional[str] = None,
+        semestre: Optional[str] = None,
+        promo: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """Get RAG chunks filtered by classification, including embedding and embedding_dtype"""
+        return self._select_rag_chunks(
+            CHUNK_COLUMNS + ", c.embedding, c.embedding_dtype",
+            matiere, sous_matiere, enseignant, semestre, promo, limit
+        )
+    
+    def get_rag_chunks_iter(
+        self,
+        matiere: Optional[str] = None,
+        sous_matiere: Optional[str] = None,
+        enseignant: Optional[str] = None,
+        semestre: Optional[str] = None,
+        promo: Optional[str] = None,
+        limit: Optional[int] = None,
+        with_embeddings: bool = False
+    ) -> Iterator[sqlite3.Row]:
+        """Stream RAG chunks as sqlite3.Row objects, in index order (INDEX_ORDER)"""
+        columns = CHUNK_COLUMNS + (", c.embedding, c.embedding_dtype" if with_embeddings else "")
+        yield from self._query_rag_chunks(
+            columns, matiere, sous_matiere, enseignant, semestre, promo, limit, INDEX_ORDER
+        )
+    
+    def get_rag_chunks_after_iter(self, after_id: int, with_embeddings: bool = False) -> Iterator[sqlite3.Row]:
+        """Stream the chunks added after row id after_id, in index order (incremental index updates)"""
+        columns = CHUNK_COLUMNS + (", c.embedding, c.embedding_dtype" if with_embeddings else "")
         cursor = self.connection.cursor()
-        query = f"""
-            SELECT c.*, f.filename, f.doc_id, f.doc_label
+        cursor.execute(f"""
+            SELECT {columns}
             FROM rag_chunks c
             JOIN files f ON c.file_id = f.id
-            WHERE {where_clause}
-            ORDER BY c.created_at DESC
-            {limit_clause}
-        """
+            WHERE c.id > ?
+            ORDER BY {INDEX_ORDER}
+        """, (after_id,))
+        yield from cursor
 
-        if params:
-            cursor.execute(query, params)
+    def get_chunk_index_state(self, up_to_id: Optional[int] = None) -> Tuple[int, int]:
+        """(count, max row id) of the chunks, restricted to row ids <= up_to_id if given"""
+        cursor = self.connection.cursor()
+        if up_to_id is None:
+            cursor.execute("SELECT COUNT(1), COALESCE(MAX(id), 0) FROM rag_chunks")
         else:
-            cursor.execute(query)
+            cursor.execute("SELECT COUNT(1), COALESCE(MAX(id), 0) FROM rag_chunks WHERE id <= ?", (up_to_id,))
+        count, max_id = cursor.fetchone()
+        return count, max_id
+    
+    def get_rag_chunks_tokens_iter(self) -> Iterator[sqlite3.Row]:
+        """Stream (tokens, chunk_text) in index order; chunk_text is only read when tokens is NULL"""
+        yield from self._query_rag_chunks(
+            "c.tokens, CASE WHEN c.tokens IS NULL THEN c.chunk_text END AS chunk_text",
+            None, None, None, None, None, None, INDEX_ORDER
+        )
+    
+    def _select_rag_chunks(
+        self,
+        columns: str,
+        matiere: Optional[str],
+        sous_matiere: Optional[str],
+        enseignant: Optional[str],
+        semestre: Optional[str],
+        promo: Optional[str],
+        limit: Optional[int]
+    ) -> List[Dict]:
+        """Shared query for the chunk getters"""
+        return _rows_as_dicts(self._query_rag_chunks(
+            columns, matiere, sous_matiere, enseignant, semestre, promo, limit
+        ))
+    
+    def _query_rag_chunks(
+        self,
+        columns: str,
+        matiere: Optional[str],
+        sous_matiere: Optional[str],
+        enseignant: Optional[str],
+        semestre: Optional[str],
+        promo: Optional[str],
+        limit: Optional[int],
+        order_by: str = "c.created_at DESC"
+    ) -> sqlite3.Cursor:
+        """Execute the filtered chunk query and return the open cursor"""
+        where_clause, params = self._chunk_filters(matiere, sous_matiere, enseignant, semestre, promo)
+        params.append(limit if limit else -1)  # LIMIT -1 = pas de limite pour SQLite
+        # Filtre enseignant = le plus sélectif : on impose l'index qui le place en tête
+        index_hint = "INDEXED BY idx_chunks_enseignant" if enseignant not in (None, "", "null") else ""
+
+        cursor = self.connection.cursor()
+        cursor.execute(f"""
+            SELECT {columns}
+            FROM rag_chunks c {index_hint}
+            JOIN files f ON c.file_id = f.id
+            WHERE {where_clause}
+            ORDER BY {order_by}
+            LIMIT ?
+        """, params)
+        return cursor
+    
+    def count_rag_chunks(
+        self,
+        matiere: Optional[str] = None,
+        sous_matiere: Optional[str] = None,
+        enseignant: Optional[str] = None,
+        semestre: Optional[str] = None,
+        promo: Optional[str] = None
+    ) -> int:
+        """Count RAG chunks matching the classification (answered from the indexes)"""
+        where_clause, params = self._chunk_filters(matiere, sous_matiere, enseignant, semestre, promo)
+        cursor = self.connection.cursor()
+        cursor.execute(f"SELECT COUNT(1) FROM rag_chunks c WHERE {where_clause}", params)
+        return cursor.fetchone()[0]
+    
+    def count_embedding_dimensions(self) -> Dict[int, int]:
+        """Count stored embeddings per dimension, from the BLOB length and dtype (no decoding)"""
+        cursor = self.connection.cursor()
+        cursor.execute("""
+            SELECT COALESCE(embedding_dtype, 'float32'), length(embedding), COUNT(1)
+            FROM rag_chunks
+            WHERE embedding IS NOT NULL
+            GROUP BY 1, 2
+        """)
+        dims: Dict[int, int] = {}
+        for dtype, size, count in cursor.fetchall():
+            if dtype == 'int8':
+                size -= INT8_SCALE_BYTES
+            dim = size // EMBEDDING_ITEMSIZE.get(dtype, 4)
+            dims[dim] = dims.get(dim, 0) + count
+        return dims
+    
+    def _chunk_filters(
+        self,
+        matiere: Optional[str],
+        sous_matiere: Optional[str],
+        enseignant: Optional[str],
+        semestre: Optional[str],
+        promo: Optional[str]
+    ) -> Tuple[str, List]:
+        """Build the WHERE clause and params for the chunk classification filters"""
+        conditions = []
+        params = []
+        for column, value in (
+            ('c.matiere', matiere),
+            ('c.sous_matiere', sous_matiere),
+            ('c.enseignant', enseignant),
+            ('c.semestre', semestre),
+            ('c.promo', promo),
+        ):
+            if value not in (None, "", "null"):
+                conditions.append(f"{column} = ?")
+                params.append(value)
         
-        return [dict(row) for row in cursor.fetchall()]
+        where_clause = " AND ".join(conditions) if conditions else "1=1"
+        return where_clause, params
     
     def get_file_summary(self) -> List[Dict]:
         """Get summary of all files with processing status"""
         cursor = self.connection.cursor()
         cursor.execute("SELECT * FROM file_summary ORDER BY upload_date DESC")
-        return [dict(row) for row in cursor.fetchall()]
+        return _rows_as_dicts(cursor)
     
     def delete_file(self, file_id: int) -> bool:
         """Delete a file and all its chunks"""
         cursor = self.connection.cursor()
         
-        # Get file info before deletion
-        file_info = self.get_file_by_id(file_id)
-        if not file_info:
-            return False
-        
-        # Delete chunks first (foreign key constraint)
-        cursor.execute("DELETE FROM rag_chunks WHERE file_id = ?", (file_id,))
-        
-        # Delete file
+        # Chunks and tags follow through ON DELETE CASCADE (PRAGMA foreign_keys=ON in _connect)
         cursor.execute("DELETE FROM files WHERE id = ?", (file_id,))
+        deleted = cursor.rowcount > 0
         
         self.connection.commit()
-        return True
+        return deleted
     
     def update_file_metadata(
         self,
@@ -342,11 +805,25 @@ class DatabaseManager:
             SET {', '.join(updates)}
             WHERE id = ?
         """, params)
+        updated = cursor.rowcount > 0
+        if updated and tags is not None:
+            self._set_file_tags(file_id, tags)
         
         self.connection.commit()
-        return cursor.rowcount > 0
+        return updated
     
 
+    def get_files_by_tag(self, tag: str) -> List[Dict]:
+        """Get files carrying a tag (indexed lookup on file_tags)"""
+        cursor = self.connection.cursor()
+        cursor.execute("""
+            SELECT f.* FROM file_tags t
+            JOIN files f ON f.id = t.file_id
+            WHERE t.tag = ?
+            ORDER BY f.upload_date DESC
+        """, (tag,))
+        return _rows_as_dicts(cursor)
+
     def update_file_status(self, file_id: int, status: str):
         """Update file status manually"""
         cursor = self.connection.cursor()
@@ -369,76 +846,56 @@ class DatabaseManager:
         promo: Optional[str] = None
     ) -> List[Dict]:
         """Search files with optional text search and filters"""
-        conditions = []
-        params = []
-        
-        if query:
-            conditions.append("(filename LIKE ? OR doc_label LIKE ? OR description LIKE ?)")
-            query_param = f"%{query}%"
-            params.extend([query_param, query_param, query_param])
-        
-        if matiere:
-            conditions.append("matiere = ?")
-            params.append(matiere)
-        if sous_matiere:
-            conditions.append("sous_matiere = ?")
-            params.append(sous_matiere)
-        if enseignant:
-            conditions.append("enseignant = ?")
-            params.append(enseignant)
-        if semestre:
-            conditions.append("semestre = ?")
-            params.append(semestre)
-        if promo:
-            conditions.append("promo = ?")
-            params.append(promo)
-        
-        where_clause = " AND ".join(conditions) if conditions else "1=1"
-        
+        where_clause, filter_params = _file_filters(None, matiere, sous_matiere, enseignant, semestre, promo)
         cursor = self.connection.cursor()
-        cursor.execute(f"""
-            SELECT * FROM files 
-            WHERE {where_clause}
-            ORDER BY upload_date DESC
-        """, params)
+        if self._files_fts and query and len(query) >= FTS_MIN_QUERY_LENGTH:
+            # Chaîne entre guillemets = recherche de sous-chaîne (insensible à la casse) dans les trois champs
+            phrase = '"' + query.replace('"', '""') + '"'
+            cursor.execute(SEARCH_FILES_FTS.format(where=where_clause), [phrase] + filter_params)
+        elif query:
+            cursor.execute(SEARCH_FILES.format(where=where_clause), [f"%{query}%"] * 3 + filter_params)
+        else:
+            cursor.execute(SELECT_FILES_BY_CLASSIFICATION.format(where=where_clause), filter_params)
         
-        return [dict(row) for row in cursor.fetchall()]
+        return _rows_as_dicts(cursor)
     
     def _calculate_file_hash(self, file_path: Path) -> str:
         """Calculate SHA256 hash of file"""
-        hash_sha256 = hashlib.sha256()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_sha256.update(chunk)
-        return hash_sha256.hexdigest()
+        return calculate_file_hash(file_path)
     
     def _generate_doc_id(self, base_name: str, matiere: str) -> str:
         """Generate unique document ID"""
-        import re
-        
         # Clean base name
-        clean_base = re.sub(r'[^a-z0-9]+', '-', base_name.lower()).strip('-')
-        clean_matiere = re.sub(r'[^a-z0-9]+', '-', matiere.lower()).strip('-')
+        clean_base = _SLUG_RE.sub('-', base_name.lower()).strip('-')
+        clean_matiere = _SLUG_RE.sub('-', matiere.lower()).strip('-')
+        base_doc_id = f"{clean_matiere}-{clean_base}"
         
-        # Check for uniqueness
+        # Check for uniqueness : une seule lecture de idx_files_doc_id pour tous les suffixes
+        # (GLOB est sensible à la casse, donc utilisable par l'index contrairement à LIKE)
         cursor = self.connection.cursor()
-        base_doc_id = f"{clean_matiere}-{clean_base}"
-        doc_id = base_doc_id
+        cursor.execute(
+            "SELECT doc_id FROM files WHERE doc_id = ? OR doc_id GLOB ?",
+            (base_doc_id, f"{base_doc_id}-[0-9]*")
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        if base_doc_id not in existing:
+            return base_doc_id
+
+        # Premier suffixe libre base-1, base-2... (même numérotation que la recherche pas à pas d'origine)
         counter = 1
-        
-        while True:
-            cursor.execute("SELECT id FROM files WHERE doc_id = ?", (doc_id,))
-            if not cursor.fetchone():
-                break
-            doc_id = f"{base_doc_id}-{counter}"
+        while f"{base_doc_id}-{counter}" in existing:
             counter += 1
-        
-        return doc_id
+        return f"{base_doc_id}-{counter}"
     
     def close(self):
         """Close database connection"""
         if self.connection:
+            try:
+                self.connection.execute("PRAGMA optimize")
+            except sqlite3.Error:
+                pass
             self.connection.close()
+            self.connection = None
     
     def __enter__(self):
         return self
@@ -448,44 +905,167 @@ class DatabaseManager:
 
 
 # Utility functions for integration with existing RAG system
+def encode_embedding(embedding, dtype: str = "float16") -> bytes:
+    """Serialize an embedding to a contiguous BLOB of the given dtype ('int8' = scale + int8 values)"""
+    import numpy as np
+    if dtype == "int8":
+        embedding = np.asarray(embedding, dtype=np.float32)
+        scale = np.float32(np.abs(embedding).max(initial=0.0) / 127.0) or np.float32(1.0)
+        quantized = np.clip(np.rint(embedding / scale), -127, 127).astype(np.int8)
+        return scale.tobytes() + quantized.tobytes()
+    return np.ascontiguousarray(embedding, dtype=dtype).tobytes()
+
+
+def unit_normalize(embeddings) -> "np.ndarray":
+    """Scale float32 embeddings (one vector or one per row) to unit L2 norm, in place when already float32"""
+    import numpy as np
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if not embeddings.flags.writeable:  # vue np.frombuffer sur un BLOB
+        embeddings = embeddings.copy()
+    norms = np.sqrt(np.einsum('...i,...i->...', embeddings, embeddings))
+    embeddings /= norms[..., None] + 1e-12
+    return embeddings
+
+
+def decode_embedding(blob: bytes, dtype: Optional[str] = None) -> "np.ndarray":
+    """Read an embedding BLOB back as float32 (anciennes lignes sans dtype = float32)"""
+    import numpy as np
+    if dtype == "int8":
+        scale = np.frombuffer(blob, dtype=np.float32, count=1)[0]
+        return np.frombuffer(blob, dtype=np.int8, offset=INT8_SCALE_BYTES).astype(np.float32) * scale
+    embedding = np.frombuffer(blob, dtype=dtype or "float32")
+    return embedding if embedding.dtype == np.float32 else embedding.astype(np.float32)
+
+
+def _dump_vector_item(item: Dict) -> bytes:
+    """Serialize one vector_db.json entry (embedding as a float32 numpy array)"""
+    if orjson is not None:
+        return orjson.dumps(item, option=orjson.OPT_SERIALIZE_NUMPY)
+    item = dict(item, embedding=item['embedding'].tolist())
+    return json.dumps(item, ensure_ascii=False).encode('utf-8')
+
+
+def embeddings_sidecar_path(vector_db_path) -> Path:
+    """Path of the float32 .npy matrix written next to vector_db.json (vector_db.embeddings.npy)"""
+    vector_db_path = Path(vector_db_path)
+    return vector_db_path.with_name(f"{vector_db_path.stem}.embeddings.npy")
+
+
 def export_to_vector_db(db_manager: DatabaseManager, output_path: str = "vector_db.json"):
-    """Export database chunks to the existing vector_db.json format"""
-    chunks = db_manager.get_rag_chunks_by_classification()
-    
-    vector_db_data = []
-    for chunk in chunks:
-        # Convert binary embedding back to numpy array
-        embedding = np.frombuffer(chunk['embedding'], dtype=np.float32)
-
-        # Récupération sécurisée avec valeurs par défaut
-        metadata = {
-            'doc_id': chunk.get('doc_id', ''),
-            'doc_label': chunk.get('doc_label', ''),
-            'chunk_id': chunk.get('chunk_id', ''),
-            'page': chunk.get('page_number', 0),
-            'chunk_index': chunk.get('chunk_index', 0),
-            'matiere': chunk.get('matiere', ''),
-            'sous_matiere': chunk.get('sous_matiere', ''),  # ✅ plus de KeyError
-            'enseignant': chunk.get('enseignant', ''),
-            'semestre': chunk.get('semestre', ''),
-            'promo': chunk.get('promo', ''),
-            'filename': chunk.get('filename', '')
-        }
-
-        vector_db_data.append({
-            'text': chunk.get('chunk_text', ''),
-            'embedding': embedding.tolist(),
-            'metadata': metadata
-        })
+    """Export database chunks to the existing vector_db.json format
+
+    Les embeddings sont aussi écrits en une matrice float32 (n, d) dans
+    embeddings_sidecar_path(output_path), chargée en mmap par HybridRetriever
+    (pas de sidecar si les dimensions diffèrent).
+    """
+    import numpy as np
+    sidecar_path = embeddings_sidecar_path(output_path)
+    # Matrice dimensionnée d'après les agrégats SQL et remplie ligne à ligne (rien n'est empilé en mémoire) ;
+    # écrite à côté puis renommée, pour ne pas tronquer un sidecar ouvert en mmap par le serveur
+    total = db_manager.count_rag_chunks()
+    dims = db_manager.count_embedding_dimensions()
+    matrix = None
+    if total and len(dims) == 1 and sum(dims.values()) == total:
+        tmp_path = sidecar_path.with_name(sidecar_path.name + ".tmp")
+        matrix = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(total, next(iter(dims))))
+    chunks = db_manager.get_rag_chunks_iter(with_embeddings=True)
+    count = 0
+    
+    # Écriture en flux : une ligne SQLite -> une entrée JSON, sans liste intermédiaire
+    with open(output_path, 'wb') as f:
+        f.write(b'[')
+        for count, chunk in enumerate(chunks, start=1):
+            # Vue numpy directe sur le BLOB (copie uniquement pour convertir le float16)
+            embedding = decode_embedding(chunk['embedding'], chunk['embedding_dtype'])
+
+            metadata = {
+                'doc_id': chunk['doc_id'],
+                'doc_label': chunk['doc_label'],
+                'chunk_id': chunk['chunk_id'],
+                'page': chunk['page_number'],
+                'chunk_index': chunk['chunk_index'],
+                'matiere': chunk['matiere'],
+                'sous_matiere': chunk['sous_matiere'],
+                'enseignant': chunk['enseignant'],
+                'semestre': chunk['semestre'],
+                'promo': chunk['promo'],
+                'filename': chunk['filename']
+            }
+
+            if count > 1:
+                f.write(b',\n')
+            f.write(_dump_vector_item({
+                'text': chunk['chunk_text'],
+                'embedding': embedding,
+                'metadata': metadata
+            }))
+            if matrix is not None and count <= total:
+                matrix[count - 1] = embedding
+        f.write(b']')
+    
+    if matrix is not None and count == total:
+        matrix.flush()
+        del matrix
+        tmp_path.replace(sidecar_path)
+    else:
+        if matrix is not None:  # Chunks ajoutés ou supprimés pendant l'export : pas de sidecar incohérent
+            del matrix
+            tmp_path.unlink()
+        if sidecar_path.exists():
+            sidecar_path.unlink()
+    print(f"Exported {count} chunks to {output_path}")
+
+
+def _prepare_import(doc_id: str, file_data: Dict, embedding_dtype: str) -> Dict:
+    """Prepare one file of vector_db.json for insertion (runs in a worker process)
+
+    Crée le fichier de substitution si besoin, calcule le hash et encode les
+    embeddings : tout ce qui ne touche pas à la connexion SQLite.
+    """
+    metadata = file_data['metadata']
     
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(vector_db_data, f, ensure_ascii=False, indent=2)
+    # Create a dummy file path if the original file doesn't exist
+    original_filename = metadata.get('filename', f"{doc_id}.pdf")
+    if not Path(original_filename).exists():
+        # Create a placeholder file for database purposes
+        placeholder_path = f"imported_{doc_id}.pdf"
+        with open(placeholder_path, 'w') as f:
+            f.write(f"Imported from vector_db.json - Original: {original_filename}")
+        file_path = placeholder_path
+    else:
+        file_path = original_filename
     
-    print(f"Exported {len(vector_db_data)} chunks to {output_path}")
+    chunks = []
+    for item in file_data['chunks']:
+        chunks.append({
+            'chunk_id': item['metadata']['chunk_id'],
+            'chunk_text': item['text'],
+            'page_number': item['metadata'].get('page'),
+            'chunk_index': item['metadata'].get('chunk_index'),
+            'embedding': encode_embedding(unit_normalize(item['embedding']), embedding_dtype),
+            'embedding_dtype': embedding_dtype,
+            'embedding_model': 'hf.co/CompendiumLabs/bge-base-en-v1.5-gguf',
+            'matiere': metadata['matiere'],
+            'sous_matiere': metadata['sous_matiere'],
+            'enseignant': metadata['enseignant'],
+            'semestre': metadata['semestre'],
+            'promo': metadata['promo']
+        })
+    
+    return {
+        'file_path': file_path,
+        'file_hash': calculate_file_hash(Path(file_path)),
+        'chunks': chunks
+    }
+
 
+def import_from_vector_db(db_manager: DatabaseManager, vector_db_path: str, workers: Optional[int] = None):
+    """Import existing vector_db.json into the database
 
-def import_from_vector_db(db_manager: DatabaseManager, vector_db_path: str):
-    """Import existing vector_db.json into the database"""
+    La préparation (hash, encodage des embeddings) est répartie sur ``workers``
+    processus ; les écritures restent dans le processus principal, sur la
+    connexion de ``db_manager``. ``workers=1`` désactive le parallélisme.
+    """
     try:
         with open(vector_db_path, 'r', encoding='utf-8') as f:
             vector_data = json.load(f)
@@ -505,57 +1085,46 @@ def import_from_vector_db(db_manager: DatabaseManager, vector_db_path: str):
             }
         files_data[doc_id]['chunks'].append(item)
     
-    for doc_id, file_data in files_data.items():
-        metadata = file_data['metadata']
+    executor = ProcessPoolExecutor(max_workers=workers) if workers != 1 else None
+    try:
+        if executor:
+            pending = {
+                doc_id: executor.submit(_prepare_import, doc_id, file_data, db_manager.embedding_dtype)
+                for doc_id, file_data in files_data.items()
+            }
         
-        # Add file to database
-        try:
-            # Create a dummy file path if the original file doesn't exist
-            original_filename = metadata.get('filename', f"{doc_id}.pdf")
-            if not Path(original_filename).exists():
-                # Create a placeholder file for database purposes
-                placeholder_path = f"imported_{doc_id}.pdf"
-                with open(placeholder_path, 'w') as f:
-                    f.write(f"Imported from vector_db.json - Original: {original_filename}")
-                file_path = placeholder_path
-            else:
-                file_path = original_filename
-                
-            file_id = db_manager.add_file(
-                file_path=file_path,
-                matiere=metadata.get('matiere', 'Unknown'),
-                sous_matiere=metadata.get('sous_matiere', 'Unknown'),
-                enseignant=metadata.get('enseignant', 'Unknown'),
-                semestre=metadata.get('semestre', 'Unknown'),
-                promo=metadata.get('promo', 'Unknown'),
-                doc_id=doc_id,
-                doc_label=metadata.get('doc_label', doc_id)
-            )
-            
-            # Add chunks
-            chunks = []
-            for item in file_data['chunks']:
-                chunks.append({
-                    'chunk_id': item['metadata']['chunk_id'],
-                    'chunk_text': item['text'],
-                    'page_number': item['metadata'].get('page'),
-                    'chunk_index': item['metadata'].get('chunk_index'),
-                    'embedding': np.array(item['embedding']),
-                    'embedding_model': 'hf.co/CompendiumLabs/bge-base-en-v1.5-gguf',
-                    'matiere': metadata['matiere'],
-                    'sous_matiere': metadata['sous_matiere'],
-                    'enseignant': metadata['enseignant'],
-                    'semestre': metadata['semestre'],
-                    'promo': metadata['promo']
-                })
-            
-            db_manager.add_rag_chunks(file_id, chunks)
-            db_manager.mark_file_processed(file_id, len(chunks))
+        for doc_id, file_data in files_data.items():
+            metadata = file_data['metadata']
             
-            print(f"Imported {doc_id}: {len(chunks)} chunks")
-            
-        except Exception as e:
-            print(f"Error importing {doc_id}: {e}")
+            # Add file to database
+            try:
+                if executor:
+                    prepared = pending.pop(doc_id).result()
+                else:
+                    prepared = _prepare_import(doc_id, file_data, db_manager.embedding_dtype)
+                
+                # Fichier + chunks + statut dans une seule transaction (un seul commit par fichier)
+                chunks = prepared['chunks']
+                db_manager.add_file_bulk(
+                    chunks,
+                    file_path=prepared['file_path'],
+                    matiere=metadata.get('matiere', 'Unknown'),
+                    sous_matiere=metadata.get('sous_matiere', 'Unknown'),
+                    enseignant=metadata.get('enseignant', 'Unknown'),
+                    semestre=metadata.get('semestre', 'Unknown'),
+                    promo=metadata.get('promo', 'Unknown'),
+                    doc_id=doc_id,
+                    doc_label=metadata.get('doc_label', doc_id),
+                    file_hash=prepared['file_hash']
+                )
+                
+                print(f"Imported {doc_id}: {len(chunks)} chunks")
+                
+            except Exception as e:
+                print(f"Error importing {doc_id}: {e}")
+    finally:
+        if executor:
+            executor.shutdown()
 
 
 if __name__ == "__main__":
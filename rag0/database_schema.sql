@@ -13,6 +13,7 @@ CREATE TABLE files (
     
     -- Classification fields
     matiere TEXT NOT NULL,
+    sous_matiere TEXT,
     enseignant TEXT NOT NULL,
     semestre TEXT NOT NULL,
     promo TEXT NOT NULL,
@@ -27,6 +28,7 @@ CREATE TABLE files (
     is_processed BOOLEAN DEFAULT FALSE,
     processing_date TIMESTAMP,
     chunk_count INTEGER DEFAULT 0,
+    status TEXT DEFAULT 'en attente',
     
     -- File integrity
     file_hash TEXT, -- SHA256 hash for duplicate detection
@@ -44,11 +46,14 @@ CREATE TABLE rag_chunks (
     chunk_index INTEGER,
     
     -- Embedding and search data
-    embedding BLOB, -- Store embedding as binary data
+    embedding BLOB, -- Store embedding as binary data (L2-normalised: unit norm)
+    embedding_dtype TEXT DEFAULT 'float32', -- numpy dtype of the embedding BLOB ('float16', 'float32', or 'int8' = float32 scale + int8 values)
     embedding_model TEXT,
+    tokens TEXT, -- BM25 tokens joined by spaces (computed at ingestion)
     
     -- Metadata for filtering
     matiere TEXT NOT NULL,
+    sous_matiere TEXT,
     enseignant TEXT NOT NULL,
     semestre TEXT NOT NULL,
     promo TEXT NOT NULL,
@@ -63,6 +68,14 @@ CREATE TABLE rag_chunks (
     FOREIGN KEY (file_id) REFERENCES files (id) ON DELETE CASCADE
 );
 
+-- Normalized tags (one row per file/tag) for indexed tag filters
+CREATE TABLE file_tags (
+    file_id INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (file_id, tag),
+    FOREIGN KEY (file_id) REFERENCES files (id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
 -- Table for storing search history and analytics
 CREATE TABLE search_history (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -83,29 +96,25 @@ CREATE TABLE system_config (
 );
 
 -- Indexes for performance
-CREATE INDEX idx_files_classification ON files(matiere, enseignant, semestre, promo);
+CREATE INDEX idx_files_classif ON files(matiere, sous_matiere, enseignant, semestre, promo, upload_date DESC);
+CREATE INDEX idx_files_hash ON files(file_hash);
+CREATE INDEX idx_files_doc_id ON files(doc_id);
+CREATE INDEX idx_files_status ON files(status);
 CREATE INDEX idx_files_processed ON files(is_processed);
 CREATE INDEX idx_chunks_file_id ON rag_chunks(file_id);
-CREATE INDEX idx_chunks_classification ON rag_chunks(matiere, enseignant, semestre, promo);
+CREATE INDEX idx_chunks_classif ON rag_chunks(matiere, sous_matiere, enseignant, semestre, promo, created_at DESC);
+CREATE INDEX idx_chunks_enseignant ON rag_chunks(enseignant, sous_matiere, matiere, semestre, promo);
 CREATE INDEX idx_chunks_chunk_id ON rag_chunks(chunk_id);
+CREATE INDEX idx_file_tags_tag ON file_tags(tag, file_id);
 CREATE INDEX idx_search_history_timestamp ON search_history(timestamp);
 
 -- Views for common queries
 CREATE VIEW file_summary AS
-SELECT 
-    f.id,
-    f.filename,
-    f.matiere,
-    f.enseignant,
-    f.semestre,
-    f.promo,
-    f.is_processed,
-    f.chunk_count,
-    f.upload_date,
-    COUNT(c.id) as actual_chunks
+SELECT f.*, COALESCE(cc.n, 0) AS actual_chunks
 FROM files f
-LEFT JOIN rag_chunks c ON f.id = c.file_id
-GROUP BY f.id, f.filename, f.matiere, f.enseignant, f.semestre, f.promo, f.is_processed, f.chunk_count, f.upload_date;
+LEFT JOIN (
+    SELECT file_id, COUNT(*) AS n FROM rag_chunks GROUP BY file_id
+) cc ON cc.file_id = f.id;
 
 -- Insert default configuration
 INSERT INTO system_config (key, value, description) VALUES
@@ -32,7 +32,7 @@ def main():
     parser.add_argument('--bm25-k', type=int, default=40, help='Number of BM25 candidates to pull before fusion')
     parser.add_argument('--vector-db', default='vector_db.json', help='Path to vector_db.json')
     parser.add_argument('--faiss-index', default='vector_index.faiss', help='Path to FAISS index file')
-    parser.add_argument('--bm25-index', default='bm25_index.pkl', help='Path to BM25 index file')
+    parser.add_argument('--bm25-index', default='bm25_index', help='Path to BM25 index directory (falls back to <path>.pkl)')
     parser.add_argument('--meta', default='index_meta.json', help='Path to index metadata file')
     args = parser.parse_args()
 
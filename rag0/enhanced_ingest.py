@@ -5,10 +5,12 @@ Combines the original ingest_pdf.py functionality with database management
 
 import argparse
 import json
-import pickle
+import os
 import re
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Protocol, Tuple
 
 import numpy as np
 import ollama
@@ -20,26 +22,49 @@ except ImportError as exc:  # pragma: no cover
     raise SystemExit('Faiss est requis. Installez-le avec `pip install faiss-cpu`.') from exc
 
 try:
-    from rank_bm25 import BM25Okapi
+    import bm25s  # type: ignore
 except ImportError as exc:  # pragma: no cover
-    raise SystemExit('rank_bm25 est requis. Installez-le avec `pip install rank_bm25`.') from exc
+    raise SystemExit('bm25s est requis. Installez-le avec `pip install bm25s`.') from exc
 
-from database_manager import DatabaseManager, export_to_vector_db
+from database_manager import INDEX_ORDER, DatabaseManager, decode_embedding, export_to_vector_db, unit_normalize
 
 
 DEFAULT_EMBEDDING_MODEL = 'hf.co/CompendiumLabs/bge-base-en-v1.5-gguf'
+DEFAULT_EMBED_BATCH = 64  # Chunks envoyés par requête d'embedding
+EMBED_WORKERS = 4  # Requêtes d'embedding concurrentes (le serveur gère la concurrence)
+EMBEDDING_BACKENDS = ('ollama', 'vllm')
+DEFAULT_VLLM_URL = 'http://vllm:8000'  # Serveur vLLM compatible OpenAI (vllm serve BAAI/bge-base-en-v1.5 --task embed)
+VLLM_TIMEOUT = 300  # Secondes par requête /v1/embeddings
+FAISS_ADD_BATCH = 10000  # Vecteurs normalisés puis ajoutés à l'index par lot
+FAISS_INDEX_TYPES = ('flat', 'sq8', 'hnsw', 'hnsw-sq8', 'ivfpq')
+HNSW_M = 32  # Voisins par nœud du graphe HNSW
+HNSW_EF_CONSTRUCTION = 200
+IVFPQ_TRAIN_SAMPLE = 100000  # Vecteurs max. pour entraîner IVF-PQ (pris dans le premier lot)
+IVFPQ_M = 8  # Sous-quantifieurs PQ (doit diviser la dimension)
+IVFPQ_NBITS = 8
+IVFPQ_MIN_VECTORS = 39 * (1 << IVFPQ_NBITS)  # 39 points par centroïde PQ (minimum conseillé par FAISS)
+PARALLEL_MIN_PAGES = 50  # En dessous, l'extraction reste séquentielle (coût de démarrage du pool)
+PAGES_PER_TASK = 10  # Pages extraites par tâche du pool (un fitz.open par tâche)
 TOKEN_PATTERN = re.compile(r"\b\w+\b", re.UNICODE)
 
 
 def chunk_text(text: str, size: int = 500, overlap: int = 50) -> List[str]:
     """Split text into overlapping chunks"""
     print(f"[DEBUG] Chunking text of length {len(text)}")
-    words = text.split()
+    # Normalise les espaces une fois, puis découpe par tranches à partir des bornes de mots
+    normalized = ' '.join(text.split())
+    if not normalized:
+        return []
+    codepoints = np.frombuffer(normalized.encode('utf-32-le'), dtype=np.uint32)
+    spaces = np.flatnonzero(codepoints == 32)
+    starts = np.concatenate(([0], spaces + 1))
+    ends = np.concatenate((spaces, [len(normalized)]))
+    n_words = len(starts)
     chunks = []
-    for i in range(0, len(words), size - overlap):
-        chunk = ' '.join(words[i:i + size])
-        if len(chunk.strip()) > 50:
-            chunks.append(chunk)
+    for i in range(0, n_words, size - overlap):
+        start, end = starts[i], ends[min(i + size, n_words) - 1]
+        if end - start > 50:
+            chunks.append(normalized[start:end])
     return chunks
 
 
@@ -48,12 +73,81 @@ def tokenize(text: str) -> List[str]:
     return TOKEN_PATTERN.findall(text.lower())
 
 
+def extract_pages(pdf_path: str, start: int, stop: int) -> List[str]:
+    """Extract the text of pages [start, stop) with a Document opened in this process"""
+    with fitz.open(pdf_path) as doc:
+        return [doc[page_num].get_text() for page_num in range(start, stop)]
+
+
+def extract_text_by_page(pdf_path: Path, total_pages: int) -> List[str]:
+    """Extract page texts in order, in a process pool for large PDFs (MuPDF documents can't be shared)"""
+    if total_pages < PARALLEL_MIN_PAGES or (os.cpu_count() or 1) < 2:
+        return extract_pages(str(pdf_path), 0, total_pages)
+
+    starts = range(0, total_pages, PAGES_PER_TASK)
+    stops = [min(start + PAGES_PER_TASK, total_pages) for start in starts]
+    texts = []
+    with ProcessPoolExecutor() as executor:
+        for page_texts in executor.map(extract_pages, [str(pdf_path)] * len(starts), starts, stops):
+            texts.extend(page_texts)
+    return texts
+
+
+class EmbeddingClient(Protocol):
+    """Embedding backend: one request per list of texts, float32 rows in input order"""
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        ...
+
+
+class OllamaClient:
+    """Embeddings from the local Ollama server (ollama.embed)"""
+
+    def __init__(self, model: str = DEFAULT_EMBEDDING_MODEL):
+        self.model = model
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        response = ollama.embed(model=self.model, input=texts)
+        return np.asarray(response["embeddings"], dtype=np.float32)
+
+
+class VLLMClient:
+    """Embeddings from a vLLM server through its OpenAI-compatible /v1/embeddings route (continuous batching)"""
+
+    def __init__(self, model: str, base_url: str = DEFAULT_VLLM_URL, timeout: float = VLLM_TIMEOUT):
+        self.model = model
+        self.url = f"{base_url.rstrip('/')}/v1/embeddings"
+        self.timeout = timeout
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps({"model": self.model, "input": texts}).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            data = json.load(response)["data"]
+        embeddings = np.empty((len(data), len(data[0]["embedding"])), dtype=np.float32)
+        for item in data:
+            embeddings[item["index"]] = item["embedding"]
+        return embeddings
+
+
+def make_embedding_client(backend: str, model: str, vllm_url: str = DEFAULT_VLLM_URL) -> EmbeddingClient:
+    """Build the embedding client for a backend name of EMBEDDING_BACKENDS"""
+    if backend == 'vllm':
+        return VLLMClient(model, vllm_url)
+    return OllamaClient(model)
+
+
 def process_pdf_file(
     pdf_path: str,
     metadata: Dict,
     embedding_model: str,
     db_manager: DatabaseManager,
-    file_id: Optional[int] = None
+    file_id: Optional[int] = None,
+    embed_batch: int = DEFAULT_EMBED_BATCH,
+    embedder: Optional[EmbeddingClient] = None
 ) -> int:
     """
     Process a PDF file and store in database.
@@ -61,16 +155,19 @@ def process_pdf_file(
     Args:
         pdf_path (str): Path to the PDF file.
         metadata (Dict): Classification metadata (matiere, sous_matiere, etc.).
-        embedding_model (str): Ollama embedding model.
+        embedding_model (str): Embedding model id (recorded with each chunk).
         db_manager (DatabaseManager): Database manager instance.
         file_id (Optional[int]): Existing file ID if already created.
+        embed_batch (int): Number of chunks embedded per request.
+        embedder (Optional[EmbeddingClient]): Embedding backend (Ollama with embedding_model by default).
 
     Returns:
-        Tuple[int, List[List[str]]]: File ID and BM25 corpus.
+        int: File ID (the BM25 index is rebuilt from the database afterwards).
     """
     pdf_path = Path(pdf_path)
     if not pdf_path.exists():
         raise FileNotFoundError(f"PDF not found: {pdf_path}")
+    embedder = embedder or OllamaClient(embedding_model)
 
     # ✅ Use provided file_id or add a new file entry
     if not file_id:
@@ -88,31 +185,27 @@ def process_pdf_file(
     print(f"Added or using existing file: {pdf_path.name} (ID: {file_id})")
 
     # ✅ Process PDF
-    doc = fitz.open(pdf_path)
+    with fitz.open(pdf_path) as doc:
+        total_pages = len(doc)
+    page_texts = extract_text_by_page(pdf_path, total_pages)
     chunks_data = []
-    bm25_corpus = []
 
-    total_pages = len(doc)
-    for page_num in range(total_pages):
-        text = doc[page_num].get_text()
+    for page_num, text in enumerate(page_texts):
         if not text.strip():
             continue  # Skip empty pages
 
         page_chunks = chunk_text(text)
 
         for idx, chunk in enumerate(page_chunks):
-            # Generate embedding
-            embedding = ollama.embed(model=embedding_model, input=chunk)["embeddings"][0]
-            embedding_array = np.array(embedding, dtype=np.float32)
-
-            # Build chunk data
+            # Build chunk data (embedding filled in batches below)
             chunk_id = f"{metadata.get('doc_id', pdf_path.stem)}:{page_num + 1}:{idx}"
             chunk_data = {
                 "chunk_id": chunk_id,
                 "chunk_text": chunk,
                 "page_number": page_num + 1,
                 "chunk_index": idx,
-                "embedding": embedding_array,
+                "embedding": None,
+                "tokens": ' '.join(tokenize(chunk)),
                 "embedding_model": embedding_model,
                 "matiere": metadata.get("matiere"),
                 "sous_matiere": metadata.get("sous_matiere"),
@@ -122,46 +215,131 @@ def process_pdf_file(
             }
 
             chunks_data.append(chunk_data)
-            bm25_corpus.append(tokenize(chunk))
 
         print(f"Processed page {page_num + 1}/{total_pages}", end="\r")
 
-    doc.close()
-
-    print(f"[DEBUG] {len(chunks_data)} chunks ready for DB insert.")
+    print(f"[DEBUG] {len(chunks_data)} chunks ready for embedding and DB insert.")
     if len(chunks_data) > 0:
         print(f"Example chunk: {chunks_data[0]['chunk_text'][:200]}")
 
-        # ✅ Store chunks in database
-        db_manager.add_rag_chunks(file_id, chunks_data)
-        db_manager.mark_file_processed(file_id, len(chunks_data))
-
-        print(f"\nProcessed {len(chunks_data)} chunks from {pdf_path.name}")
-        return file_id, bm25_corpus
+        # ✅ Embed batches in worker threads, outside any transaction: other writers
+        # (uploads, metadata edits) are not blocked while the embedding backend works
+        batches = [chunks_data[start:start + embed_batch] for start in range(0, len(chunks_data), embed_batch)]
+        with ThreadPoolExecutor(max_workers=EMBED_WORKERS) as executor:
+            embedded = 0
+            for batch in executor.map(embed_batch_chunks, batches, [embedder] * len(batches)):
+                embedded += len(batch)
+                print(f"Embedded {embedded}/{len(chunks_data)} chunks", end="\r")
 
+        # ✅ Then one short transaction for all chunks and the file status
+        with db_manager.connection:
+            db_manager.add_rag_chunks(file_id, chunks_data, autocommit=False)
+            db_manager.mark_file_processed(file_id, len(chunks_data), autocommit=False)
 
-def build_faiss_index_from_db(db_manager: DatabaseManager, output_path: str):
-    """Build FAISS index from database chunks (robust handling of embedding formats)
+        print(f"\nProcessed {len(chunks_data)} chunks from {pdf_path.name}")
+    return file_id
+
+
+def embed_batch_chunks(batch: List[Dict], embedder: EmbeddingClient) -> List[Dict]:
+    """Fill the embedding of each chunk of the batch with a single embedding request"""
+    # Normalisés une fois ici : les vecteurs stockés sont unitaires, l'index FAISS les ajoute tels quels
+    embeddings = unit_normalize(embedder.embed([c["chunk_text"] for c in batch]))
+    for chunk_data, embedding in zip(batch, embeddings):
+        chunk_data["embedding"] = embedding
+    return batch
+
+
+def create_faiss_index(index_type: str, dim: int, n_vectors: int):
+    """Create an empty inner-product FAISS index (vectors are L2-normalised: IP = cosine)"""
+    if index_type == 'ivfpq' and n_vectors < IVFPQ_MIN_VECTORS:
+        # Petit corpus : trop peu de points pour entraîner les 256 centroïdes PQ (train() échoue) -> sq8
+        print(f"Only {n_vectors} vectors (< {IVFPQ_MIN_VECTORS}) for IVF-PQ training: using sq8 instead.")
+        index_type = 'sq8'
+    if index_type == 'sq8':
+        return faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+    if index_type in ('hnsw', 'hnsw-sq8'):
+        if index_type == 'hnsw-sq8':  # Graphe HNSW sur vecteurs stockés en 8 bits (4x moins de mémoire)
+            index = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_8bit, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        return index
+    if index_type == 'ivfpq':
+        # ~4·sqrt(N) listes, au moins 39 points d'entraînement par liste
+        nlist = max(1, min(1024, int(4 * np.sqrt(n_vectors)), n_vectors // 39))
+        quantizer = faiss.IndexFlatIP(dim)
+        return faiss.IndexIVFPQ(quantizer, dim, nlist, IVFPQ_M, IVFPQ_NBITS, faiss.METRIC_INNER_PRODUCT)
+    return faiss.IndexFlatIP(dim)
+
+
+def build_faiss_index_from_db(
+    db_manager: DatabaseManager,
+    output_path: str,
+    batch_size: int = FAISS_ADD_BATCH,
+    index_type: str = 'flat',
+    append_after: Optional[int] = None
+):
+    """Build FAISS index from database chunks
 
     NOTE:
-      - Certains embeddings peuvent être stockés sous forme de liste de floats,
-        de bytes (buffer), ou d'autres formats. Cette version essaye de
-        normaliser tous les embeddings en tableaux numpy de dtype float32,
-        filtre les embeddings invalides et conserve la dimension la plus
-        fréquente si nécessaire.
+      - Les embeddings sont des BLOB binaires (float16/float32 selon
+        embedding_dtype) ; les anciennes lignes JSON sont converties à
+        l'ouverture de la base. Cette version filtre les embeddings invalides
+        et conserve la dimension la plus fréquente si nécessaire.
+      - Les chunks sont lus en flux et ajoutés à l'index par lots de
+        batch_size vecteurs via un tampon float32 réutilisé : la mémoire
+        de travail ne dépend pas de la taille du corpus.
+      - index_type : 'flat' (exact), 'sq8' (8 bits par composante),
+        'hnsw' (graphe, sans entraînement), 'hnsw-sq8' (graphe sur vecteurs
+        8 bits) ou 'ivfpq' (compressé) ; les index à entraîner le sont sur
+        le premier lot.
+      - append_after : mise à jour incrémentale, seuls les chunks d'id
+        supérieur (ajoutés depuis la dernière construction, voir
+        incremental_start) sont ajoutés à l'index existant (ordre
+        INDEX_ORDER = ajout en fin). Reconstruction complète si l'index
+        résultant n'est pas aligné sur la base.
     """
-    chunks = db_manager.get_rag_chunks_by_classification()
-
-    if not chunks:
-        print("No chunks found in database")
+    dims = db_manager.count_embedding_dimensions()
+    if not dims:
+        print("No valid embeddings found")
         return
 
-    embeddings = []
+    # Vérifier la consistance dimensionnelle
+    dim = max(dims, key=dims.get)
+
+    if append_after is not None and Path(output_path).exists():
+        index = faiss.read_index(output_path)
+        if index.d == dim:
+            chunks = db_manager.get_rag_chunks_after_iter(append_after, with_embeddings=True)
+            before = index.ntotal
+            bad_count = _fill_faiss_index(index, chunks, dim, batch_size)
+            if index.ntotal == dims[dim]:
+                faiss.write_index(index, output_path)
+                print(f"Added {index.ntotal - before} vectors to FAISS index ({index.ntotal} total, skipped {bad_count} invalid embeddings)")
+                return
+        print(f"FAISS index out of sync with the database ({index.ntotal} vectors). Full rebuild...")
+
+    if len(dims) > 1:
+        print(f"Dimension inconsistency detected: {dims}. Keeping embeddings of dim={dim} ({dims[dim]}/{sum(dims.values())}).")
+
+    index = create_faiss_index(index_type, dim, dims[dim])
+    if not index.is_trained:
+        # Le premier lot sert d'échantillon d'entraînement (sq8, hnsw-sq8, ivfpq)
+        batch_size = max(batch_size, min(dims[dim], IVFPQ_TRAIN_SAMPLE))
+    bad_count = _fill_faiss_index(index, db_manager.get_rag_chunks_iter(with_embeddings=True), dim, batch_size)
+
+    faiss.write_index(index, output_path)
+    print(f"Built FAISS index with {index.ntotal} vectors (skipped {bad_count} invalid embeddings)")
+
+
+def _fill_faiss_index(index, chunks: Iterable, dim: int, batch_size: int) -> int:
+    """Decode chunk embeddings of dimension dim into a reused buffer and add them by batch; returns the bad count"""
+    buffer = np.empty((batch_size, dim), dtype=np.float32)
+    filled = 0
     bad_count = 0
-    dims = []
 
     for idx, chunk in enumerate(chunks):
-        raw_emb = chunk.get('embedding', None)
+        raw_emb = chunk['embedding']
 
         # Skip missing embeddings
         if raw_emb is None:
@@ -169,113 +347,159 @@ def build_faiss_index_from_db(db_manager: DatabaseManager, output_path: str):
             continue
 
         try:
-            # Case 1: embedding already a numpy-compatible sequence (list/tuple)
-            if isinstance(raw_emb, (list, tuple)):
-                arr = np.array(raw_emb, dtype=np.float32)
-
-            # Case 2: embedding stored as bytes/bytearray (raw buffer)
-            elif isinstance(raw_emb, (bytes, bytearray)):
-                # Assumer float32 little-endian (typique quand on stocke buffers)
-                arr = np.frombuffer(raw_emb, dtype=np.float32)
-
-            # Case 3: embedding serialized as string (e.g., JSON string)
-            elif isinstance(raw_emb, str):
-                # Essayer de parser la string en list si c'est du JSON
-                try:
-                    parsed = json.loads(raw_emb)
-                    arr = np.array(parsed, dtype=np.float32)
-                except Exception:
-                    # Dernière chance : essayer conversion numpy directe
-                    try:
-                        arr = np.array(json.loads(raw_emb), dtype=np.float32)
-                    except Exception:
-                        continue
-
-            # Fallback : tenter conversion brute-force
-            else:
-                arr = np.array(raw_emb, dtype=np.float32)
-
-            # Vérifier que l'embedding n'est pas vide et est 1D
-            if arr.size == 0 or arr.ndim != 1:
-                bad_count += 1
-                continue
-
-            embeddings.append(arr)
-            dims.append(arr.shape[0])
-
+            # dtype enregistré avec le chunk (float16 ou float32 little-endian)
+            arr = decode_embedding(raw_emb, chunk['embedding_dtype'])
         except Exception as e:
             # Log et continuer (ne pas interrompre la construction de l'index)
             print(f"Warning: failed to convert embedding for chunk index {idx}: {e}")
             bad_count += 1
             continue
 
-    if not embeddings:
-        print("No valid embeddings found")
-        return
+        # Dimension minoritaire : écartée (comptée à part dans le message ci-dessus)
+        if arr.shape[0] != dim:
+            continue
 
-    # Vérifier la consistance dimensionnelle
-    unique_dims = set(dims)
-    if len(unique_dims) > 1:
-        from collections import Counter
-        counter = Counter(dims)
-        most_common_dim, count = counter.most_common(1)[0]
-        print(f"Dimension inconsistency detected: {dict(counter)}. Keeping embeddings of dim={most_common_dim} ({count}/{len(dims)}).")
-
-        # Filtrer pour ne garder que la dimension la plus fréquente
-        filtered_embeddings = [e for e in embeddings if e.shape[0] == most_common_dim]
-        if not filtered_embeddings:
-            print("After filtering by most common dimension, no embeddings remain.")
-            return
-        matrix = np.vstack(filtered_embeddings).astype(np.float32)
-
-    else:
-        # Toutes les dimensions identiques — empiler directement
-        matrix = np.vstack(embeddings).astype(np.float32)
-
-    # Normaliser et construire l'index FAISS
-    faiss.normalize_L2(matrix)
-    index = faiss.IndexFlatIP(matrix.shape[1])
-    index.add(matrix)
-    faiss.write_index(index, output_path)
-    print(f"Built FAISS index with {index.ntotal} vectors (skipped {bad_count} invalid embeddings)")
+        buffer[filled] = arr
+        filled += 1
+        if filled == batch_size:
+            _add_faiss_batch(index, buffer)
+            filled = 0
+
+    if filled:
+        _add_faiss_batch(index, buffer[:filled])
+    return bad_count
 
 
+def _add_faiss_batch(index, batch: np.ndarray):
+    """Add a batch of unit-norm vectors, training the index on it first if needed"""
+    if not index.is_trained:
+        index.train(batch)
+    index.add(batch)
+
 
 def build_bm25_index_from_db(db_manager: DatabaseManager, output_path: str):
-    """Build BM25 index from database chunks"""
-    chunks = db_manager.get_rag_chunks_by_classification()
-    
-    if not chunks:
-        print("No chunks found in database")
-        return
-    
-    corpus = []
-    for chunk in chunks:
-        tokens = tokenize(chunk['chunk_text'])
-        corpus.append(tokens)
+    """Build BM25 index from database chunks (tokens stored at ingestion, tokenize() for older rows)"""
+    corpus = [
+        row['tokens'].split() if row['tokens'] is not None else tokenize(row['chunk_text'])
+        for row in db_manager.get_rag_chunks_tokens_iter()
+    ]
     
     if not corpus:
         print("No corpus found")
         return
     
-    bm25 = BM25Okapi(corpus)
-    with open(output_path, 'wb') as fh:
-        pickle.dump({'bm25': bm25}, fh)
+    bm25 = bm25s.BM25(k1=1.5, b=0.75)
+    bm25.index(corpus, show_progress=False)
+    bm25.save(output_path, show_progress=False)
     print(f"Built BM25 index with {len(corpus)} documents")
 
 
-def save_meta(path: str, chunk_count: int, embedding_model: str):
+def save_meta(
+    path: str, chunk_count: int, embedding_model: str, index_type: str = 'flat', last_chunk_row_id: int = 0
+):
     """Save metadata about the index"""
     meta = {
         'embedding_model': embedding_model,
         'chunk_count': chunk_count,
-        'database_integrated': True
+        'last_chunk_row_id': last_chunk_row_id,  # Plus grand rag_chunks.id indexé (mises à jour incrémentales)
+        'database_integrated': True,
+        'index_type': index_type,
+        'chunk_order': INDEX_ORDER
     }
     with open(path, 'w', encoding='utf-8') as fh:
         json.dump(meta, fh, indent=2, ensure_ascii=False)
     print(f"Saved metadata to {path}")
 
 
+def incremental_start(meta_path: str, index_type: str, db_manager: DatabaseManager) -> Optional[int]:
+    """Row id after which chunks can be appended to the existing indexes, or None for a full rebuild
+
+    Requires an index built in INDEX_ORDER with the same index type, and every chunk indexed
+    then still present: after a deletion, FAISS row i no longer matches vector_db.json row i.
+    """
+    if not Path(meta_path).exists():
+        return None
+    with open(meta_path, 'r', encoding='utf-8') as fh:
+        meta = json.load(fh)
+    if meta.get('chunk_order') != INDEX_ORDER or meta.get('index_type', 'flat') != index_type:
+        return None
+    last_row_id = meta.get('last_chunk_row_id')
+    if last_row_id is None:  # Index antérieur à last_chunk_row_id
+        return None
+    count, _ = db_manager.get_chunk_index_state(last_row_id)
+    return last_row_id if count == meta.get('chunk_count') else None
+
+
+def refresh_indexes(
+    db_manager: DatabaseManager,
+    embedding_model: str,
+    output: str = 'vector_db.json',
+    faiss_index: str = 'vector_index.faiss',
+    bm25_index: str = 'bm25_index',
+    meta_output: str = 'index_meta.json',
+    index_type: str = 'flat',
+    file_ids: Optional[List[int]] = None
+):
+    """Export vector_db.json and rebuild the FAISS/BM25 indexes (FAISS appended to when file_ids is given and the index allows it)"""
+    # Export to vector_db.json format for compatibility
+    print("Exporting to vector_db.json...")
+    export_to_vector_db(db_manager, output)
+
+    # Build indexes (append only the chunks added since the last build when the existing index allows it)
+    chunk_count, last_row_id = db_manager.get_chunk_index_state()
+    append_after = incremental_start(meta_output, index_type, db_manager) if file_ids is not None else None
+    print("Updating FAISS index..." if append_after is not None else "Building FAISS index...")
+    build_faiss_index_from_db(db_manager, faiss_index, index_type=index_type, append_after=append_after)
+
+    print("Building BM25 index...")
+    build_bm25_index_from_db(db_manager, bm25_index)
+
+    # Save metadata
+    save_meta(meta_output, chunk_count, embedding_model, index_type, last_row_id)
+
+
+def run_ingestion(
+    pdf_path: str,
+    metadata: Dict,
+    file_id: int,
+    db_manager: DatabaseManager,
+    embedding_model: str = DEFAULT_EMBEDDING_MODEL
+) -> int:
+    """Ingest an already registered file and refresh the indexes (in-process entry point)"""
+    process_pdf_file(pdf_path, metadata, embedding_model, db_manager, file_id=file_id)
+    refresh_indexes(db_manager, embedding_model, file_ids=[file_id])
+    return file_id
+
+
+def run_ingestion_batch(
+    files: List[Tuple[int, str, Dict]],
+    db_manager: DatabaseManager,
+    embedding_model: str = DEFAULT_EMBEDDING_MODEL
+) -> Dict[int, Optional[str]]:
+    """
+    Ingest several registered files, then refresh the indexes once for all of them.
+
+    Args:
+        files: (file_id, pdf_path, metadata) tuples.
+
+    Returns:
+        Dict[int, Optional[str]]: Error message per file ID (None when ingested).
+    """
+    errors: Dict[int, Optional[str]] = {}
+    for file_id, pdf_path, metadata in files:
+        try:
+            process_pdf_file(pdf_path, metadata, embedding_model, db_manager, file_id=file_id)
+            errors[file_id] = None
+        except Exception as e:
+            print(f"Error processing {pdf_path}: {e}")
+            errors[file_id] = str(e)
+
+    ingested = [file_id for file_id, error in errors.items() if error is None]
+    if ingested:
+        refresh_indexes(db_manager, embedding_model, file_ids=ingested)
+    return errors
+
+
 def main():
     parser = argparse.ArgumentParser(description='Enhanced PDF ingestion with database integration')
     parser.add_argument('--pdf', action='append', required=True, help='Path to a PDF (can be repeated)')
@@ -285,18 +509,24 @@ def main():
     parser.add_argument('--promo', required=True, help='Promo/Year, e.g., 2025')
     parser.add_argument('--semestre', required=True, help='Semester, e.g., S1')
     parser.add_argument('--file_id', type=int, help='Existing file ID in database (optional)')
-    parser.add_argument('--embed-model', default=DEFAULT_EMBEDDING_MODEL, help='Ollama embedding model id')
+    parser.add_argument('--embed-model', default=DEFAULT_EMBEDDING_MODEL, help='Embedding model id (e.g. BAAI/bge-base-en-v1.5 with vllm)')
+    parser.add_argument('--embedding-backend', choices=EMBEDDING_BACKENDS, default='ollama', help='Embedding server: ollama, or vllm for high-throughput batch ingest')
+    parser.add_argument('--vllm-url', default=DEFAULT_VLLM_URL, help='Base URL of the vLLM OpenAI-compatible server')
+    parser.add_argument('--embed-batch', type=int, default=DEFAULT_EMBED_BATCH, help='Chunks per embedding request')
     parser.add_argument('--output', default='vector_db.json', help='Output JSON DB path')
     parser.add_argument('--faiss-index', default='vector_index.faiss', help='FAISS index output path')
-    parser.add_argument('--bm25-index', default='bm25_index.pkl', help='BM25 index output path')
+    parser.add_argument('--index-type', choices=FAISS_INDEX_TYPES, default='flat', help='FAISS index type (flat exact, sq8 8-bit, hnsw, hnsw-sq8 or ivfpq for large corpora)')
+    parser.add_argument('--embedding-dtype', choices=('float32', 'float16', 'int8'), default='float16', help='Storage precision of embeddings in the database')
+    parser.add_argument('--bm25-index', default='bm25_index', help='BM25 index output directory')
     parser.add_argument('--meta-output', default='index_meta.json', help='Index metadata output path')
     parser.add_argument('--db-path', default='rag_database.db', help='SQLite database path')
     parser.add_argument('--export-only', action='store_true', help='Only export from database, don\'t process new files')
     parser.add_argument('--import-existing', action='store_true', help='Import existing vector_db.json into database')
+    parser.add_argument('--full-rebuild', action='store_true', help='Rebuild the FAISS index from all chunks instead of appending the new ones')
     
     args = parser.parse_args()
     
-    with DatabaseManager(args.db_path) as db_manager:
+    with DatabaseManager(args.db_path, embedding_dtype=args.embedding_dtype) as db_manager:
         
         if args.import_existing:
             # Import existing vector_db.json into database
@@ -319,14 +549,9 @@ def main():
             }
             if args.file_id:
                 print(f"Using existing file ID: {args.file_id}")
+            new_file_ids = []
+            embedder = make_embedding_client(args.embedding_backend, args.embed_model, args.vllm_url)
                 
-            all_bm25_corpus = []
-
-
-
-
-
-
             for pdf_path in args.pdf:
                 # Generate doc_id for this PDF
                 pdf_name = Path(pdf_path).stem
@@ -337,28 +562,21 @@ def main():
                 pdf_metadata['doc_label'] = pdf_name
                 
                 try:
-                    file_id, bm25_corpus = process_pdf_file(
-                        pdf_path, pdf_metadata, args.embed_model, db_manager
-                    )
-                    all_bm25_corpus.extend(bm25_corpus)
+                    new_file_ids.append(process_pdf_file(
+                        pdf_path, pdf_metadata, args.embed_model, db_manager,
+                        embed_batch=args.embed_batch, embedder=embedder
+                    ))
                     print(f"Successfully processed: {pdf_path}")
                 except Exception as e:
                     print(f"Error processing {pdf_path}: {e}")
         
-        # Export to vector_db.json format for compatibility
-        print("Exporting to vector_db.json...")
-        export_to_vector_db(db_manager, "vector_db.json")
-        
-        # Build indexes
-        print("Building FAISS index...")
-        build_faiss_index_from_db(db_manager, args.faiss_index)
-        
-        print("Building BM25 index...")
-        build_bm25_index_from_db(db_manager, args.bm25_index)
-        
-        # Save metadata
-        chunks = db_manager.get_rag_chunks_by_classification()
-        save_meta(args.meta_output, len(chunks), args.embed_model)
+        append_only = not (args.full_rebuild or args.import_existing or args.export_only)
+        refresh_indexes(
+            db_manager, args.embed_model,
+            faiss_index=args.faiss_index, bm25_index=args.bm25_index,
+            meta_output=args.meta_output, index_type=args.index_type,
+            file_ids=new_file_ids if append_only else None
+        )
         
         # Show summary
         summary = db_manager.get_file_summary()
@@ -3,9 +3,10 @@ File Management Web Interface for ECE Paris RAG System
 Provides web interface for managing files, classifications, and database operations
 """
 
+import asyncio
+import hashlib
 import json
 from pathlib import Path
-import sys
 from typing import Dict, List, Optional
 
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Query
@@ -15,7 +16,7 @@ from fastapi.templating import Jinja2Templates
 from fastapi.requests import Request
 from pydantic import BaseModel
 
-from database_manager import DatabaseManager
+from database_manager import HASH_BUFFER_SIZE, DatabaseManager
 
 
 # Pydantic models for API
@@ -67,6 +68,13 @@ templates = Jinja2Templates(directory="templates")
 # Global database manager
 db_manager = None
 
+# Upload ingestion queue: a single worker, since ingestions rewrite the shared index files
+# and hold the SQLite write lock while embedding; files queued close together share one index refresh
+INGEST_WORKERS = 1
+INGEST_QUEUE_SIZE = 64  # Uploads en attente avant de faire patienter upload_file
+INGEST_MAX_BATCH = 8  # Fichiers regroupés par rafraîchissement des index
+INGEST_MAX_WAIT = 2.0  # Secondes d'attente pour compléter un lot
+
 
 def get_db_manager():
     global db_manager
@@ -80,16 +88,71 @@ async def startup_event():
     """Initialize database on startup"""
     global db_manager
     db_manager = DatabaseManager()
+    app.state.ingest_queue = asyncio.Queue(maxsize=INGEST_QUEUE_SIZE)
+    app.state.ingest_workers = [
+        asyncio.create_task(ingest_worker(app.state.ingest_queue)) for _ in range(INGEST_WORKERS)
+    ]
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Close database on shutdown"""
     global db_manager
+    for worker in app.state.ingest_workers:
+        worker.cancel()
     if db_manager:
         db_manager.close()
 
 
+def ingest_uploaded_files(batch: List[tuple]) -> Dict[int, Optional[str]]:
+    """Run enhanced_ingest in this process, on a dedicated connection for the worker thread"""
+    from enhanced_ingest import run_ingestion_batch  # fitz/faiss/ollama chargés au premier upload seulement
+
+    with DatabaseManager(get_db_manager().db_path) as ingest_db:
+        return run_ingestion_batch(batch, ingest_db)
+
+
+async def ingest_worker(queue: asyncio.Queue):
+    """Take uploads from the queue, group up to INGEST_MAX_BATCH within INGEST_MAX_WAIT, ingest them"""
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = [await queue.get()]
+        deadline = loop.time() + INGEST_MAX_WAIT
+        while len(batch) < INGEST_MAX_BATCH:
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), deadline - loop.time()))
+            except asyncio.TimeoutError:
+                break
+
+        print(f"[🚀] Processing {len(batch)} file(s): {[file_id for file_id, _, _ in batch]} ...")
+        try:
+            errors = await asyncio.to_thread(ingest_uploaded_files, batch)
+        except Exception as e:
+            errors = {file_id: str(e) for file_id, _, _ in batch}
+
+        db = get_db_manager()
+        for file_id, error in errors.items():
+            if error is None:
+                # ✅ Update status once processed
+                db.update_file_status(file_id, "traite")
+                print(f"[✅] File {file_id} processed successfully.")
+            else:
+                db.update_file_status(file_id, f"erreur: {error}")
+                print(f"[❌] Error processing file {file_id}: {error}")
+        for _ in batch:
+            queue.task_done()
+
+
+def save_upload(source, destination: Path) -> str:
+    """Copy an upload to disk by blocks, hashing it on the way (blocking: run in a thread)"""
+    digest = hashlib.sha256()
+    with open(destination, "wb") as out:
+        while block := source.read(HASH_BUFFER_SIZE):
+            digest.update(block)
+            out.write(block)
+    return digest.hexdigest()
+
+
 # API Endpoints
 
 @app.get("/")
@@ -164,9 +227,6 @@ async def upload_file(
     3. Launch background processing (chunking + embeddings)
     4. Update database status: 'en traitement' → 'traité'
     """
-    import subprocess
-    import threading
-
     db = get_db_manager()
     
     # Parse tags if provided
@@ -175,15 +235,27 @@ async def upload_file(
         try:
             tag_list = json.loads(tags)
         except json.JSONDecodeError:
-            tag_list = [tag.strip() for t in tags.split(',') if t.strip()]
+            tag_list = [t.strip() for t in tags.split(',') if t.strip()]
     
     # Save uploaded file
     upload_dir = Path("uploads")
     upload_dir.mkdir(exist_ok=True)
     file_path = upload_dir / file.filename
 
-    with open(file_path, "wb") as f:
-        f.write(await file.read())
+    # Streamed copy + SHA256 off the event loop (no full read into memory)
+    file_hash = await asyncio.to_thread(save_upload, file.file, file_path)
+
+    # Same content already ingested: nothing to do
+    existing = db.get_file_by_hash(file_hash)
+    if existing and existing.get("is_processed"):
+        if Path(existing["file_path"]).resolve() != file_path.resolve():
+            file_path.unlink()
+        return {
+            "message": "File already ingested",
+            "file_id": existing["id"],
+            "filename": existing["filename"],
+            "status": existing.get("status")
+        }
     
     try:
          # Add file entry in database (initially 'en attente')
@@ -197,39 +269,25 @@ async def upload_file(
             doc_id=doc_id,
             doc_label=doc_label,
             description=description,
-            tags=tag_list
+            tags=tag_list,
+            file_hash=file_hash
         )
        # 🟡 Mark as "en traitement"
         db.update_file_status(file_id, "en traitement")
 
-        # 🧠 Define background function to run enhanced_ingest.py
-        def process_in_background():
-            try:
-                cmd = [
-                    sys.executable, "enhanced_ingest.py",
-                    "--pdf", str(file_path),
-                    "--matiere", matiere,
-                    "--sous_matiere", sous_matiere,
-                    "--enseignant", enseignant,
-                    "--promo", str(promo),
-                    "--semestre", semestre,
-                    "--file_id", str(file_id)
-                ]
-
-                print(f"[🚀] Processing {file.filename} (ID={file_id}) ...") #?? Pas sur pour l'ID A LA MANO
-                subprocess.run(cmd, check=True)
-
-                # ✅ Update status once processed
-                db.update_file_status(file_id, "traite")
-                print(f"[✅] File {file_id} processed successfully.")
-            except subprocess.CalledProcessError as e:
-                db.update_file_status(file_id, f"erreur: {e.returncode}")
-                print(f"[❌] Error processing file {file_id}: {e}")
-
-        # 🚀 Launch processing in background thread
-        thread = threading.Thread(target=process_in_background, daemon=True) #?? Recheck pour remplacer par threading.Thread(target=process_in_background, args=(file_id, file_path, metadata)).start()
+        file_info = db.get_file_by_id(file_id)
+        metadata = {
+            'matiere': matiere,
+            'sous_matiere': sous_matiere,
+            'enseignant': enseignant,
+            'semestre': semestre,
+            'promo': promo,
+            'doc_id': file_info['doc_id'],
+            'doc_label': file_info['doc_label'],
+        }
 
-        thread.start()
+        # 🚀 Queue for the ingestion worker (in-process, batched with other recent uploads)
+        await app.state.ingest_queue.put((file_id, str(file_path), metadata))
         return {
             "message": "File uploaded successfully, processing started in background",
             "file_id": file_id,
@@ -7,6 +7,15 @@ import re
 from typing import List
 
 
+# Expressions compilées une fois (appelées par ligne / par texte)
+WHITESPACE_RE = re.compile(r'\s+')
+SENTENCE_SPLIT_RE = re.compile(r'([.!?]+\s+)')
+NUMBERED_TITLE_RE = re.compile(r'^(\d+|[IVX]+)[\.\)]\s+[A-Z]')
+NUMBERED_PREFIX_RE = re.compile(r'^(\d+|[IVX]+)[\.\)]\s+')
+CAPITALIZED_TITLE_RE = re.compile(r'^[A-Z][a-z]+(\s+[A-Z][a-z]+)*$')
+CAPITALIZED_START_RE = re.compile(r'^[A-Z][a-z]+')
+
+
 def chunk_by_paragraphs(text: str, max_words: int = 500, min_words: int = 50) -> List[str]:
     """
     Découpe le texte en paragraphes, puis combine les petits paragraphes
@@ -21,7 +30,7 @@ def chunk_by_paragraphs(text: str, max_words: int = 500, min_words: int = 50) ->
         Liste de chunks de texte
     """
     # Nettoyer le texte
-    text = re.sub(r'\s+', ' ', text)  # Normaliser les espaces
+    text = WHITESPACE_RE.sub(' ', text)  # Normaliser les espaces
     text = text.strip()
     
     # Séparer par doubles sauts de ligne (paragraphes)
@@ -92,10 +101,10 @@ def chunk_with_smart_overlap(text: str, size: int = 500, overlap: int = 100) ->
         Liste de chunks avec overlap intelligent
     """
     # Nettoyer le texte
-    text = re.sub(r'\s+', ' ', text).strip()
+    text = WHITESPACE_RE.sub(' ', text).strip()
     
     # Découper en phrases (approximatif)
-    sentences = re.split(r'([.!?]+\s+)', text)
+    sentences = SENTENCE_SPLIT_RE.split(text)
     # Recombiner les phrases avec leurs ponctuations
     sentences = [sentences[i] + (sentences[i+1] if i+1 < len(sentences) else '') 
                  for i in range(0, len(sentences)-1, 2)]
@@ -183,12 +192,12 @@ def chunk_by_sections(text: str, max_words: int = 500) -> List[str]:
             is_title = True
         
         # Numérotation (1., 2., I., II., etc.)
-        if re.match(r'^(\d+|[IVX]+)[\.\)]\s+[A-Z]', line_stripped):
+        if NUMBERED_TITLE_RE.match(line_stripped):
             is_title = True
         
         # Titre formaté (première lettre de chaque mot en majuscule, ligne courte)
         if (len(line_stripped) < 80 and 
-            re.match(r'^[A-Z][a-z]+(\s+[A-Z][a-z]+)*$', line_stripped) and
+            CAPITALIZED_TITLE_RE.match(line_stripped) and
             len(line_stripped.split()) < 10):
             is_title = True
         
@@ -244,8 +253,8 @@ def chunk_with_context(text: str, size: int = 500) -> List[str]:
         is_title = (
             len(line_stripped) < 100 and (
                 line_stripped.isupper() or
-                re.match(r'^(\d+|[IVX]+)[\.\)]\s+', line_stripped) or
-                (re.match(r'^[A-Z][a-z]+', line_stripped) and len(line_stripped.split()) < 10)
+                NUMBERED_PREFIX_RE.match(line_stripped) or
+                (CAPITALIZED_START_RE.match(line_stripped) and len(line_stripped.split()) < 10)
             )
         )
         
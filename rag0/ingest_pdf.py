@@ -1,7 +1,6 @@
 import argparse
 import hashlib
 import json
-import pickle
 import re
 from pathlib import Path
 
@@ -15,9 +14,9 @@ except ImportError as exc:  # pragma: no cover
     raise SystemExit('Faiss est requis. Installez-le avec `pip install faiss-cpu`.') from exc
 
 try:
-    from rank_bm25 import BM25Okapi
+    import bm25s  # type: ignore
 except ImportError as exc:  # pragma: no cover
-    raise SystemExit('rank_bm25 est requis. Installez-le avec `pip install rank-bm25`.') from exc
+    raise SystemExit('bm25s est requis. Installez-le avec `pip install bm25s`.') from exc
 
 from improved_chunking import improved_chunk_text
 
@@ -29,6 +28,7 @@ EXISTING_CHUNK_IDS = set()
 DOC_IDS = set()
 
 TOKEN_PATTERN = re.compile(r"\b\w+\b", re.UNICODE)
+SLUG_PATTERN = re.compile(r'[^a-z0-9]+')
 
 
 def chunk_text(text, size=500, overlap=50):
@@ -53,7 +53,7 @@ def tokenize(text: str):
 def _generate_doc_id(pdf_path: str) -> str:
     p = Path(pdf_path)
     base = p.stem.lower()
-    base = re.sub(r'[^a-z0-9]+', '-', base).strip('-') or 'doc'
+    base = SLUG_PATTERN.sub('-', base).strip('-') or 'doc'
 
     candidate = base
     suffix = 1
@@ -107,14 +107,19 @@ def save_db(filename='vector_db.json'):
     print(f"Saved {len(VECTOR_DB)} chunks to {filename}")
 
 
-def build_faiss_index(output_path: str):
+def build_faiss_index(output_path: str, index_type: str = 'flat'):
     if not EMBEDDINGS:
         print('No embeddings collected; skipping FAISS index build.')
         return
 
     matrix = np.array(EMBEDDINGS, dtype='float32')
     faiss.normalize_L2(matrix)
-    index = faiss.IndexFlatIP(matrix.shape[1])
+    if index_type == 'sq8':
+        # 1 octet par composante au lieu de 4 : moins de mémoire et de bande passante à la recherche
+        index = faiss.IndexScalarQuantizer(matrix.shape[1], faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+        index.train(matrix)
+    else:
+        index = faiss.IndexFlatIP(matrix.shape[1])
     index.add(matrix)
     faiss.write_index(index, output_path)
     print(f"Saved FAISS index with {index.ntotal} vectors to {output_path}")
@@ -125,9 +130,9 @@ def build_bm25_index(output_path: str):
         print('No corpus tokens; skipping BM25 index build.')
         return
 
-    bm25 = BM25Okapi(BM25_CORPUS)
-    with open(output_path, 'wb') as fh:
-        pickle.dump({'bm25': bm25}, fh)
+    bm25 = bm25s.BM25(k1=1.5, b=0.75)
+    bm25.index(BM25_CORPUS, show_progress=False)
+    bm25.save(output_path, show_progress=False)
     print(f"Saved BM25 index to {output_path}")
 
 
@@ -176,8 +181,9 @@ def main():
     parser.add_argument('--embed-model', default=EMBEDDING_MODEL, help='Ollama embedding model id')
     parser.add_argument('--output', default='vector_db.json', help='Output JSON DB path')
     parser.add_argument('--faiss-index', default='vector_index.faiss', help='FAISS index output path')
-    parser.add_argument('--bm25-index', default='bm25_index.pkl', help='BM25 index output path')
+    parser.add_argument('--bm25-index', default='bm25_index', help='BM25 index output directory')
     parser.add_argument('--meta-output', default='index_meta.json', help='Index metadata output path')
+    parser.add_argument('--index-type', choices=('flat', 'sq8'), default='flat', help='FAISS index type (flat exact or sq8 8-bit)')
     parser.add_argument('--append', action='store_true', help='Append to existing database if present')
     args = parser.parse_args()
     EMBEDDING_MODEL = args.embed_model
@@ -203,7 +209,7 @@ def main():
         parse_pdf(pdf, base_meta)
 
     save_db(args.output)
-    build_faiss_index(args.faiss_index)
+    build_faiss_index(args.faiss_index, args.index_type)
     build_bm25_index(args.bm25_index)
     save_meta(args.meta_output, len(VECTOR_DB))
 
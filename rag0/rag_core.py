@@ -1,8 +1,12 @@
+import asyncio
 import hashlib
 import json
+import logging
 import pickle
 import re
-import sys
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
@@ -15,17 +19,40 @@ except ImportError as exc:  # pragma: no cover
     raise SystemExit('Faiss est requis. Installez-le avec `pip install faiss-cpu`.') from exc
 
 try:
-    from rank_bm25 import BM25Okapi  # type: ignore
+    import bm25s  # type: ignore
 except ImportError as exc:  # pragma: no cover
-    raise SystemExit('rank_bm25 est requis. Installez-le avec `pip install rank-bm25`.') from exc
+    raise SystemExit('bm25s est requis. Installez-le avec `pip install bm25s`.') from exc
 
+try:
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover
+    orjson = None
+
+from database_manager import embeddings_sidecar_path
+
+try:
+    from bm25_numba import bm25_top_k_numba  # Noyau compilé (numba optionnel)
+except ImportError:  # pragma: no cover
+    bm25_top_k_numba = None
+
+
+logger = logging.getLogger(__name__)
+_logged_warnings = set()  # Avertissements déjà émis (un retriever rechargé ne les répète pas)
 
 DEFAULT_EMBEDDING_MODEL = 'hf.co/CompendiumLabs/bge-base-en-v1.5-gguf'
+TOKEN_PATTERN = re.compile(r"\b\w+\b", re.UNICODE)
+HNSW_EF_SEARCH = 64  # Taille de la liste de candidats HNSW à la recherche
+IVF_NPROBE = 16  # Listes IVF visitées par requête
+FILTER_KEYS = ('matiere', 'sous_matiere', 'enseignant', 'semestre', 'promo')  # Champs des filtres (server.py)
+FLAT_INDEX_WARN_SIZE = 50000  # Au-delà, un index exact (flat) devient coûteux par requête
+QUERY_EMBEDDING_CACHE_SIZE = 1024  # Embeddings de requêtes gardés en mémoire (LRU)
+QUERY_BATCH_MAX = 32  # Requêtes regroupées par appel ollama.embed (serveur)
+QUERY_BATCH_WAIT = 0.01  # Secondes d'attente pour compléter un lot
+FAISS_SEARCH_BATCH_MAX = 64  # Vecteurs de requête cherchés par appel index.search (serveur)
 
 
 def tokenize(text: str) -> List[str]:
-    pattern = re.compile(r"\b\w+\b", re.UNICODE)
-    return pattern.findall(text.lower())
+    return TOKEN_PATTERN.findall(text.lower())
 
 
 def metadata_matches(meta: Dict, filters: Optional[Dict]) -> bool:
@@ -34,17 +61,282 @@ def metadata_matches(meta: Dict, filters: Optional[Dict]) -> bool:
     return all(meta.get(k) == v for k, v in filters.items())
 
 
+def _warn_once(msg: str, *args) -> None:
+    """Log a warning the first time this exact message is seen in the process"""
+    key = (msg, args)
+    if key not in _logged_warnings:
+        _logged_warnings.add(key)
+        logger.warning(msg, *args)
+
+
+def min_max_normalize(values: np.ndarray) -> np.ndarray:
+    """Scale values to [0, 1] (all 1.0 when they are equal)"""
+    if not len(values):
+        return values.astype(np.float64)
+    minimum = values.min()
+    maximum = values.max()
+    if maximum == minimum:
+        return np.ones(len(values))
+    return (values - minimum) / (maximum - minimum)
+
+
 def normalize_scores(scores: Dict[int, float]) -> Dict[int, float]:
     if not scores:
         return {}
-    values = list(scores.values())
-    minimum = min(values)
-    maximum = max(values)
-    if maximum == minimum:
-        return {k: 1.0 for k in scores}
-    adjusted = {k: (v - minimum) for k, v in scores.items()}
-    scale = max(adjusted.values()) or 1.0
-    return {k: val / scale for k, val in adjusted.items()}
+    values = np.fromiter(scores.values(), dtype=np.float64, count=len(scores))
+    return dict(zip(scores, min_max_normalize(values).tolist()))
+
+
+def bm25_term_max_scores(bm25) -> np.ndarray:
+    """Max BM25 contribution of each term over all documents (MaxScore upper bounds)"""
+    data = bm25.scores['data']
+    indptr = bm25.scores['indptr']
+    max_scores = np.zeros(len(indptr) - 1, dtype=data.dtype)
+    non_empty = np.flatnonzero(indptr[1:] > indptr[:-1])
+    if len(non_empty):
+        max_scores[non_empty] = np.maximum.reduceat(data, indptr[non_empty])
+    return max_scores
+
+
+def bm25_top_k(
+    bm25, term_max: np.ndarray, query_tokens: List[str], k: int, mask: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k BM25 documents with MaxScore pruning over the bm25s CSC postings.
+
+    Terms are applied in decreasing max score; once the current k-th score exceeds what
+    the remaining terms could add, only documents still able to reach the top-k are scored.
+    With a mask, the top-k (and the pruning threshold) only consider the eligible documents.
+    """
+    eligible = np.flatnonzero(mask) if mask is not None else None
+    data = bm25.scores['data']
+    indices = bm25.scores['indices']
+    indptr = bm25.scores['indptr']
+    scores = np.zeros(bm25.scores['num_docs'], dtype=data.dtype)
+
+    term_ids, counts = np.unique(
+        np.asarray(bm25.get_tokens_ids(query_tokens), dtype=np.int64), return_counts=True
+    )
+    bounds = term_max[term_ids] * counts
+    order = np.argsort(-bounds)
+    remaining = float(bounds.sum())
+    candidates = None
+
+    for term_id, count, bound in zip(term_ids[order], counts[order], bounds[order]):
+        start, end = indptr[term_id], indptr[term_id + 1]
+        docs, contrib = indices[start:end], data[start:end] * count
+        if candidates is None:
+            scores[docs] += contrib
+        else:
+            # Postings triés par document : on ne sonde que les candidats
+            pos = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+            hit = docs[pos] == candidates
+            scores[candidates[hit]] += contrib[pos[hit]]
+        remaining -= float(bound)
+
+        pool_scores = scores if eligible is None else scores[eligible]
+        if candidates is None and k < len(pool_scores):
+            threshold = np.partition(pool_scores, -k)[-k]
+            if threshold > 0 and threshold >= remaining:
+                candidates = np.flatnonzero(pool_scores + remaining >= threshold)
+                if eligible is not None:
+                    candidates = eligible[candidates]
+
+    if candidates is not None:
+        pool = candidates
+    else:
+        pool = eligible if eligible is not None else np.arange(len(scores))
+    k = min(k, len(pool))
+    if k <= 0:
+        return pool[:0], scores[:0]
+    top = pool[np.argpartition(scores[pool], -k)[-k:]]
+    return top, scores[top]
+
+
+def _normalized_embeddings(response) -> np.ndarray:
+    """float32 matrix of an ollama embed response, rows L2-normalised in a single pass"""
+    embeddings = np.array(response['embeddings'], dtype='float32')
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+    return embeddings
+
+
+def embed_queries(model: str, queries: List[str]) -> np.ndarray:
+    """Embed several queries with one ollama.embed call; rows L2-normalised"""
+    return _normalized_embeddings(ollama.embed(model=model, input=queries))
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU of normalised query embeddings keyed by (model, query), stored as immutable bytes"""
+
+    def __init__(self, maxsize: int = QUERY_EMBEDDING_CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model: str, query: str) -> Optional[np.ndarray]:
+        with self._lock:
+            blob = self._entries.get((model, query))
+            if blob is None:
+                return None
+            self._entries.move_to_end((model, query))
+        return np.frombuffer(blob, dtype='float32')
+
+    def put(self, model: str, query: str, embedding: np.ndarray) -> np.ndarray:
+        blob = embedding.astype('float32').tobytes()
+        with self._lock:
+            self._entries[(model, query)] = blob
+            self._entries.move_to_end((model, query))
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return np.frombuffer(blob, dtype='float32')
+
+
+query_embedding_cache = QueryEmbeddingCache()
+
+
+class MicroBatcher(ABC):
+    """
+    Asyncio micro-batching: a background task takes queued requests, up to max_batch
+    arriving within max_wait seconds (max_wait=0: only those already waiting), and hands
+    them to _process as one batch.
+    """
+
+    def __init__(self, max_batch: int, max_wait: float) -> None:
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._worker:
+            self._worker.cancel()
+
+    async def _submit(self, *request):
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((*request, future))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                try:
+                    if self.max_wait > 0:
+                        batch.append(await asyncio.wait_for(self._queue.get(), deadline - loop.time()))
+                    else:
+                        batch.append(self._queue.get_nowait())
+                except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                    break
+            try:
+                await self._process(batch)
+            except Exception as exc:
+                # Erreur imprévue (réponse incomplète...) : le lot échoue, le worker continue pour les suivants
+                logger.exception("Lot de %d requêtes en échec", len(batch))
+                self._fail((request[-1] for request in batch), exc)
+
+    @abstractmethod
+    async def _process(self, batch: List[tuple]) -> None:
+        """Resolve the future of every request of the batch"""
+
+    @staticmethod
+    def _fail(futures, exc: Exception) -> None:
+        for future in futures:
+            if not future.done():
+                future.set_exception(exc)
+
+
+class QueryEmbeddingBatcher(MicroBatcher):
+    """
+    Micro-batching of concurrent query embeddings.
+
+    Queries arriving within QUERY_BATCH_WAIT seconds (up to QUERY_BATCH_MAX) share one
+    embed call on ollama.AsyncClient (no thread held during the HTTP round-trip);
+    cache hits are answered without queuing.
+    """
+
+    def __init__(self, max_batch: int = QUERY_BATCH_MAX, max_wait: float = QUERY_BATCH_WAIT) -> None:
+        super().__init__(max_batch, max_wait)
+        self._client: Optional[ollama.AsyncClient] = None
+
+    def start(self) -> None:
+        self._client = ollama.AsyncClient()
+        super().start()
+
+    async def embed(self, model: str, query: str) -> np.ndarray:
+        cached = query_embedding_cache.get(model, query)
+        if cached is not None:
+            return cached
+        return await self._submit(model, query)
+
+    async def _process(self, batch: List[tuple]) -> None:
+        by_model: Dict[str, List[Tuple[str, asyncio.Future]]] = {}
+        for model, query, future in batch:
+            by_model.setdefault(model, []).append((query, future))
+        for model, items in by_model.items():
+            queries = list(dict.fromkeys(query for query, _ in items))
+            try:
+                embeddings = _normalized_embeddings(await self._client.embed(model=model, input=queries))
+            except Exception as exc:
+                self._fail((future for _, future in items), exc)
+                continue
+            vectors = {
+                query: query_embedding_cache.put(model, query, embedding)
+                for query, embedding in zip(queries, embeddings)
+            }
+            for query, future in items:
+                if not future.done():
+                    future.set_result(vectors[query])
+
+
+class FaissSearchBatcher(MicroBatcher):
+    """
+    Batched FAISS search: query vectors waiting while a search runs are stacked into one
+    (B, d) matrix and searched together (OpenMP over the batch), with the largest k asked.
+    No added wait: under low load each query is searched alone, as before.
+    """
+
+    def __init__(self, max_batch: int = FAISS_SEARCH_BATCH_MAX) -> None:
+        super().__init__(max_batch, 0.0)
+
+    async def search(self, index, query_vec: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(distances, indices) of the k nearest vectors, as one row"""
+        return await self._submit(index, query_vec, k)
+
+    async def _process(self, batch: List[tuple]) -> None:
+        by_index: Dict[int, List[tuple]] = {}
+        for request in batch:
+            by_index.setdefault(id(request[0]), []).append(request)
+        for items in by_index.values():
+            index = items[0][0]
+            max_k = max(k for _, _, k, _ in items)
+            try:
+                queries = np.stack([query_vec for _, query_vec, _, _ in items]).astype('float32', copy=False)
+                distances, indices = await asyncio.to_thread(index.search, queries, max_k)
+            except Exception as exc:
+                self._fail((future for *_, future in items), exc)
+                continue
+            for row, (_, _, k, future) in enumerate(items):
+                if not future.done():
+                    future.set_result((distances[row, :k], indices[row, :k]))
+
+
+def bm25_from_okapi(okapi) -> "bm25s.BM25":
+    """Re-index a legacy rank_bm25 BM25Okapi as an eager bm25s index (scores precomputed per term/doc)"""
+    # doc_freqs garde les fréquences par document : l'ordre des tokens n'intervient pas dans BM25
+    corpus = [
+        [token for token, freq in doc_freqs.items() for _ in range(freq)]
+        for doc_freqs in okapi.doc_freqs
+    ]
+    bm25 = bm25s.BM25(k1=okapi.k1, b=okapi.b)
+    bm25.index(corpus, show_progress=False)
+    return bm25
 
 
 def _ensure_identifiers(metadata: Dict, chunk: str) -> Dict:
@@ -84,18 +376,32 @@ class HybridRetriever:
         self,
         vector_db_path: Path = Path('vector_db.json'),
         faiss_path: Path = Path('vector_index.faiss'),
-        bm25_path: Path = Path('bm25_index.pkl'),
+        bm25_path: Path = Path('bm25_index'),
         meta_path: Path = Path('index_meta.json'),
         embedding_model: Optional[str] = None,
+        use_gpu: bool = False,
     ) -> None:
         self.vector_db_path = vector_db_path
         self.faiss_path = faiss_path
+        legacy_bm25 = bm25_path.with_suffix('.pkl')
+        if not bm25_path.exists() and legacy_bm25.exists():
+            # Pas encore de répertoire bm25s : on reprend l'ancien bm25_index.pkl (ré-indexé au chargement)
+            bm25_path = legacy_bm25
         self.bm25_path = bm25_path
         self.meta_path = meta_path
+        self.use_gpu = use_gpu  # GPU rentable pour des requêtes par lots, pas pour une requête isolée
 
-        self.documents = self._load_documents()
+        self.documents, self.embeddings = self._load_documents()
+        # Colonnes de métadonnées (SoA) : un filtre = un masque booléen numpy
+        self.meta_arrays = {key: self._meta_column(key) for key in FILTER_KEYS}
+        self._metadata_cache: Optional[Dict] = None
+        self._value_masks: Dict[Tuple[str, object], np.ndarray] = {}  # (clé, valeur) -> masque
         self.faiss_index = self._load_faiss_index()
+        # Index FAISS non aligné sur vector_db.json : recherche exacte sur la matrice d'embeddings
+        self.brute_force = self.embeddings is not None and self.faiss_index.ntotal != len(self.documents)
         self.bm25 = self._load_bm25()
+        # Bornes MaxScore (lecture complète des scores) : inutiles avec le noyau numba
+        self.bm25_term_max = bm25_term_max_scores(self.bm25) if bm25_top_k_numba is None else None
         self.meta = self._load_meta()
 
         self.embedding_model = (
@@ -104,21 +410,93 @@ class HybridRetriever:
             or DEFAULT_EMBEDDING_MODEL
         )
 
-    def _load_documents(self) -> List[Dict]:
+    def _load_documents(self) -> Tuple[List[Dict], Optional[np.ndarray]]:
         if not self.vector_db_path.exists():
             raise SystemExit(
                 f"{self.vector_db_path} introuvable. Lancez d’abord `ingest_pdf.py`."
             )
-        with self.vector_db_path.open('r', encoding='utf-8') as fh:
-            raw = json.load(fh)
+        raw = None
+        if orjson is not None:
+            try:
+                raw = orjson.loads(self.vector_db_path.read_bytes())
+            except orjson.JSONDecodeError:
+                pass  # NaN/Infinity (embeddings corrompus) : acceptés par json seulement
+        if raw is None:
+            with self.vector_db_path.open('r', encoding='utf-8') as fh:
+                raw = json.load(fh)
         docs = []
         for item in raw:
+            # Identifiants (doc_id, chunk_id...) complétés une fois au chargement, pas à chaque requête
             docs.append({
                 'text': item['text'],
-                'metadata': item.get('metadata', {}),
-                'embedding': item.get('embedding'),
+                'metadata': _ensure_identifiers(item.get('metadata', {}), item['text']),
             })
-        return docs
+
+        # Matrice écrite par export_to_vector_db : mappée en mémoire, le champ JSON est ignoré
+        sidecar_path = embeddings_sidecar_path(self.vector_db_path)
+        if sidecar_path.exists() and sidecar_path.stat().st_mtime >= self.vector_db_path.stat().st_mtime:
+            embeddings = np.load(sidecar_path, mmap_mode='r')
+            if embeddings.ndim == 2 and len(embeddings) == len(docs):
+                return docs, embeddings
+
+        # Embeddings en une matrice float32 contiguë (n, d), lignes normalisées ; None si incomplets
+        embeddings = None
+        vectors = [item.get('embedding') for item in raw]
+        if vectors and all(vectors) and len({len(v) for v in vectors}) == 1:
+            try:
+                embeddings = np.asarray(vectors, dtype=np.float32)
+            except (TypeError, ValueError):  # valeurs nulles dans un embedding
+                return docs, None
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+        return docs, embeddings
+
+    def _meta_column(self, key: str) -> np.ndarray:
+        column = np.empty(len(self.documents), dtype=object)
+        column[:] = [doc['metadata'].get(key) for doc in self.documents]
+        return column
+
+    def get_metadata_snapshot(self) -> Dict:
+        """Filter values (sorted unique per key) and distinct combinations, computed once per loaded corpus"""
+        if self._metadata_cache is None:
+            columns = [self.meta_arrays[key].tolist() for key in FILTER_KEYS]
+            self._metadata_cache = {
+                'unique': {key: sorted({v for v in values if v}) for key, values in zip(FILTER_KEYS, columns)},
+                'records': [dict(zip(FILTER_KEYS, combo)) for combo in dict.fromkeys(zip(*columns))],
+            }
+        return self._metadata_cache
+
+    def _value_mask(self, key: str, value) -> np.ndarray:
+        """Cached read-only mask of the documents whose metadata key equals value"""
+        mask = self._value_masks.get((key, value))
+        if mask is None:
+            column = self.meta_arrays.get(key)
+            if column is None:
+                column = self.meta_arrays[key] = self._meta_column(key)
+            mask = column == value
+            mask.flags.writeable = False
+            self._value_masks[(key, value)] = mask
+        return mask
+
+    def _filter_mask(self, metadata_filter: Optional[Dict]) -> Optional[np.ndarray]:
+        """Boolean mask of the documents matching every filter value (None: no filter)"""
+        if not metadata_filter:
+            return None
+        masks = [self._value_mask(key, value) for key, value in metadata_filter.items()]
+        return masks[0] if len(masks) == 1 else np.logical_and.reduce(masks)
+
+    def _brute_force_search(
+        self, query_vec: np.ndarray, k: int, mask: Optional[np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact inner-product top-k over the embedding matrix, restricted to mask"""
+        scores = self.embeddings @ query_vec
+        if mask is not None:
+            scores[~mask] = -np.inf
+        k = min(k, len(scores))
+        top = np.argpartition(scores, -k)[-k:] if k > 0 else np.array([], dtype=np.int64)
+        top = top[np.isfinite(scores[top])]
+        top = top[np.argsort(-scores[top])]
+        return scores[top], top
 
     def _load_faiss_index(self):
         if not self.faiss_path.exists():
@@ -126,13 +504,26 @@ class HybridRetriever:
                 f'Index FAISS introuvable ({self.faiss_path}). Relancez `ingest_pdf.py`.'
             )
         index = faiss.read_index(str(self.faiss_path))
+        # Index approchés (enhanced_ingest.py --index-type) : réglages de recherche
+        if isinstance(index, faiss.IndexHNSW):
+            index.hnsw.efSearch = max(index.hnsw.efSearch, HNSW_EF_SEARCH)
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.nprobe = min(IVF_NPROBE, ivf.nlist)
+        if isinstance(faiss.downcast_index(index), faiss.IndexFlat) and index.ntotal > FLAT_INDEX_WARN_SIZE:
+            _warn_once(
+                "Index FAISS exact (flat) de %d vecteurs : recherche linéaire. "
+                "Reconstruisez-le avec `enhanced_ingest.py --full-rebuild --index-type ivfpq` (ou hnsw).",
+                index.ntotal,
+            )
+        self.on_gpu = self.use_gpu and faiss.get_num_gpus() > 0 and not isinstance(index, faiss.IndexHNSW)
+        if self.on_gpu:
+            # Paramètres de recherche (nprobe) copiés avec l'index ; HNSW n'existe pas sur GPU
+            index = faiss.index_cpu_to_all_gpus(index)
         if index.ntotal != len(self.documents):
-            print(
-                (
-                    f"[Avertissement] Index FAISS contient {index.ntotal} vecteurs, "
-                    f"mais {len(self.documents)} documents chargés."
-                ),
-                file=sys.stderr,
+            _warn_once(
+                "Index FAISS contient %d vecteurs, mais %d documents chargés.",
+                index.ntotal, len(self.documents),
             )
         return index
 
@@ -141,12 +532,22 @@ class HybridRetriever:
             raise SystemExit(
                 f'Index BM25 introuvable ({self.bm25_path}). Relancez `ingest_pdf.py`.'
             )
-        with self.bm25_path.open('rb') as fh:
-            payload = pickle.load(fh)
+        if self.bm25_path.is_dir():
+            # Index CSC (data/indices/indptr .npy) mappé en mémoire : pages chargées à la demande
+            # et partagées entre workers ; backend numba JIT si installé, sinon numpy
+            return bm25s.BM25.load(str(self.bm25_path), mmap=True, backend='auto', show_progress=False)
+        # Ancien format : BM25Okapi picklé (nécessite rank_bm25), ré-indexé en bm25s au chargement
+        try:
+            with self.bm25_path.open('rb') as fh:
+                payload = pickle.load(fh)
+        except ModuleNotFoundError as exc:
+            raise SystemExit(
+                f'{self.bm25_path} est un ancien index rank_bm25. Relancez `enhanced_ingest.py --export-only`.'
+            ) from exc
         bm25 = payload.get('bm25')
         if bm25 is None:
-            raise SystemExit('bm25_index.pkl invalide: objet BM25 absent.')
-        return bm25
+            raise SystemExit(f'{self.bm25_path} invalide: objet BM25 absent.')
+        return bm25_from_okapi(bm25)
 
     def _load_meta(self) -> Dict:
         if not self.meta_path.exists():
@@ -155,14 +556,48 @@ class HybridRetriever:
             return json.load(fh)
 
     def _prepare_query_embedding(self, query: str) -> np.ndarray:
-        response = ollama.embed(model=self.embedding_model, input=query)
-        embedding = np.array(response['embeddings'][0], dtype='float32')
-        norm = np.linalg.norm(embedding)
-        if norm > 0:
-            embedding = embedding / norm
+        cached = query_embedding_cache.get(self.embedding_model, query)
+        if cached is not None:
+            return cached
+        embedding = embed_queries(self.embedding_model, [query])[0]
+        return query_embedding_cache.put(self.embedding_model, query, embedding)
+
+    def _faiss_search(self, query_row: np.ndarray, k: int, mask: Optional[np.ndarray]):
+        """FAISS top-k for a (1, d) float32 query row, restricted to mask with an IDSelectorBitmap (the filter is applied during the search)"""
+        if mask is None or self.on_gpu:  # Sélecteurs non supportés sur GPU : post-filtrage dans retrieve
+            return self.faiss_index.search(query_row, k)
+        bitmap = np.packbits(mask, bitorder='little')  # Référencé jusqu'à la fin de la recherche
+        selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap))
+        # Les paramètres passés remplacent ceux de l'index : reprendre nprobe / efSearch réglés au chargement
+        ivf = faiss.try_extract_index_ivf(self.faiss_index)
+        if ivf is not None:
+            params = faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+        elif isinstance(self.faiss_index, faiss.IndexHNSW):
+            params = faiss.SearchParametersHNSW(sel=selector, efSearch=self.faiss_index.hnsw.efSearch)
+        else:
+            params = faiss.SearchParameters(sel=selector)
+        return self.faiss_index.search(query_row, k, params=params)
+
+    def _lexical_top_k(
+        self, query: str, bm25_k: int, mask: Optional[np.ndarray]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        query_tokens = tokenize(query) or query.lower().split()
+        # Le masque restreint le top-k BM25 aux documents éligibles (pas de post-filtrage)
+        if bm25_top_k_numba is not None:
+            lexical_ids, lexical_raw = bm25_top_k_numba(self.bm25, query_tokens, bm25_k, mask)
         else:
-            embedding = np.zeros_like(embedding)
-        return embedding
+            lexical_ids, lexical_raw = bm25_top_k(self.bm25, self.bm25_term_max, query_tokens, bm25_k, mask)
+        keep = lexical_raw > 0
+        return lexical_ids[keep].astype(np.int64), lexical_raw[keep].astype(np.float64)
+
+    def lexical_search(
+        self, query: str, bm25_k: int = 40, metadata_filter: Optional[Dict] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """BM25 top-k (doc ids, scores > 0) among the documents matching metadata_filter; needs no embedding"""
+        return self._lexical_top_k(query, bm25_k, self._filter_mask(metadata_filter))
+
+    def vector_search_k(self, vector_k: int) -> int:
+        return min(vector_k, len(self.embeddings) if self.brute_force else self.faiss_index.ntotal)
 
     def retrieve(
         self,
@@ -172,75 +607,73 @@ class HybridRetriever:
         vector_k: int = 20,
         bm25_k: int = 40,
         alpha: float = 0.65,
+        query_vec: Optional[np.ndarray] = None,
+        vector_hits: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+        lexical_hits: Optional[Tuple[np.ndarray, np.ndarray]] = None,
     ) -> List[Tuple[str, float, Dict]]:
-        query_vec = self._prepare_query_embedding(query)
-
-        vector_scores_raw: Dict[int, float] = {}
-        if self.faiss_index.ntotal:
-            k = min(vector_k, self.faiss_index.ntotal)
-            distances, indices = self.faiss_index.search(query_vec.reshape(1, -1), k)
-            for score, idx in zip(distances[0], indices[0]):
-                if idx < 0:
-                    continue
-                meta = self.documents[idx]['metadata']
-                if metadata_filter and not metadata_matches(meta, metadata_filter):
-                    continue
-                vector_scores_raw[idx] = float(score)
-
-        lexical_scores_raw: Dict[int, float] = {}
-        query_tokens = tokenize(query) or query.lower().split()
-
-        bm25_scores = self.bm25.get_scores(query_tokens)
-        if bm25_scores is not None:
-            bm25_array = np.array(bm25_scores, dtype='float32')
-            k = min(bm25_k, len(bm25_array))
-            if k > 0:
-                top_indices = np.argpartition(bm25_array, -k)[-k:]
-                for idx in top_indices:
-                    score = float(bm25_array[idx])
-                    if score <= 0:
-                        continue
-                    meta = self.documents[idx]['metadata']
-                    if metadata_filter and not metadata_matches(meta, metadata_filter):
-                        continue
-                    lexical_scores_raw[idx] = score
-
-        norm_vector = normalize_scores(vector_scores_raw)
-        norm_lexical = normalize_scores(lexical_scores_raw)
-
-        candidates = set(norm_vector.keys()) | set(norm_lexical.keys())
-        if not candidates and vector_scores_raw:
-            candidates = set(vector_scores_raw.keys())
-
+        """Hybrid top_n; vector_hits = (distances, indices) row already searched (FaissSearchBatcher),
+        lexical_hits = lexical_search result computed beforehand (e.g. while the query was being embedded)"""
+        mask = self._filter_mask(metadata_filter)
+
+        vector_ids = np.empty(0, dtype=np.int64)
+        vector_raw = np.empty(0, dtype=np.float64)
+        if vector_hits is None and (self.brute_force or self.faiss_index.ntotal):
+            if query_vec is None:
+                query_vec = self._prepare_query_embedding(query)
+            # Vue (1, d) float32 contiguë : aucune copie côté FAISS, pas de promotion float64 de la matrice
+            query_row = np.ascontiguousarray(query_vec, dtype=np.float32).reshape(1, -1)
+            k = self.vector_search_k(vector_k)
+            if self.brute_force:
+                vector_hits = self._brute_force_search(query_row[0], k, mask)
+            else:
+                distances, indices = self._faiss_search(query_row, k, mask)
+                vector_hits = (distances[0], indices[0])
+        if vector_hits is not None:
+            distances, indices = np.asarray(vector_hits[0]), np.asarray(vector_hits[1], dtype=np.int64)
+            keep = indices >= 0
+            if mask is not None:
+                keep[keep] = mask[indices[keep]]
+            vector_ids, vector_raw = indices[keep], distances[keep].astype(np.float64)
+
+        if lexical_hits is None:
+            lexical_hits = self._lexical_top_k(query, bm25_k, mask)
+        lexical_ids, lexical_raw = lexical_hits
+
+        # Fusion vectorisée sur les candidats (ids triés) : scores bruts et normalisés alignés par position
+        candidates = np.union1d(vector_ids, lexical_ids)
+        vector_pos = np.searchsorted(candidates, vector_ids)
+        lexical_pos = np.searchsorted(candidates, lexical_ids)
+        vector_scores = np.zeros(len(candidates))
+        lexical_scores = np.zeros(len(candidates))
+        combined = np.zeros(len(candidates))
+        vector_scores[vector_pos] = vector_raw
+        lexical_scores[lexical_pos] = lexical_raw
+        combined[vector_pos] += alpha * min_max_normalize(vector_raw)
+        combined[lexical_pos] += (1 - alpha) * min_max_normalize(lexical_raw)
+
+        k = min(top_n, len(candidates))
+        top = np.argpartition(-combined, k - 1)[:k] if k > 0 else np.empty(0, dtype=np.int64)
+        top = top[np.lexsort((candidates[top], -combined[top]))]  # score décroissant, puis id
+
+        # Métadonnées construites pour les top_n seulement : un dict par résultat, sans copie intermédiaire
         results: List[Tuple[str, float, Dict]] = []
-        for idx in candidates:
-            combined = alpha * norm_vector.get(idx, 0.0) + (1 - alpha) * norm_lexical.get(idx, 0.0)
-            meta = self.documents[idx]['metadata'].copy()
-            meta['vector_score'] = vector_scores_raw.get(idx, 0.0)
-            meta['lexical_score'] = lexical_scores_raw.get(idx, 0.0)
-            meta['combined_score'] = combined
-            meta = _ensure_identifiers(meta, self.documents[idx]['text'])
-            results.append((self.documents[idx]['text'], combined, meta))
-
-        results.sort(key=lambda x: x[1], reverse=True)
-
-        if len(results) < top_n:
-            extra_indices = [idx for idx in vector_scores_raw if idx not in candidates]
-            for idx in extra_indices:
-                meta = self.documents[idx]['metadata'].copy()
-                meta['vector_score'] = vector_scores_raw.get(idx, 0.0)
-                meta['lexical_score'] = lexical_scores_raw.get(idx, 0.0)
-                meta['combined_score'] = norm_vector.get(idx, 0.0)
-                meta = _ensure_identifiers(meta, self.documents[idx]['text'])
-                results.append((self.documents[idx]['text'], norm_vector.get(idx, 0.0), meta))
-                if len(results) >= top_n:
-                    break
+        for pos in top.tolist():
+            doc = self.documents[int(candidates[pos])]
+            meta = {
+                **doc['metadata'],
+                'vector_score': float(vector_scores[pos]),
+                'lexical_score': float(lexical_scores[pos]),
+                'combined_score': float(combined[pos]),
+            }
+            results.append((doc['text'], float(combined[pos]), meta))
 
-        return results[:top_n]
+        return results
 
 
 __all__ = [
     'HybridRetriever',
+    'QueryEmbeddingBatcher',
+    'FaissSearchBatcher',
     'DEFAULT_EMBEDDING_MODEL',
     'tokenize',
 ]
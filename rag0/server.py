@@ -1,7 +1,11 @@
+import asyncio
 import json
+import logging
+import os
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Optional
 
+import faiss
 import ollama
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
@@ -9,10 +13,10 @@ from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
 from output_formatter import format_response
-from rag_core import DEFAULT_EMBEDDING_MODEL, HybridRetriever
+from rag_core import DEFAULT_EMBEDDING_MODEL, FaissSearchBatcher, HybridRetriever, QueryEmbeddingBatcher
 
 
-frontend_dir = Path('frontend')
+frontend_dir = Path(__file__).resolve().parent / 'frontend'  # Indépendant du répertoire de lancement
 
 app = FastAPI(title='ECE RAG API', version='1.0')
 
@@ -42,6 +46,29 @@ class QueryRequest(BaseModel):
 
 
 retriever: Optional[HybridRetriever] = None
+# Embeddings des questions simultanées regroupés en un seul appel ollama.embed
+query_batcher = QueryEmbeddingBatcher()
+# Recherches FAISS en attente regroupées en un seul index.search (parallélisé par OpenMP)
+search_batcher = FaissSearchBatcher()
+# Client HTTP asynchrone : la génération n'occupe pas de thread pendant l'appel à Ollama
+# (créé au démarrage, dans la boucle du serveur, comme les batchers ; rien n'est lancé à l'import)
+ollama_client: Optional[ollama.AsyncClient] = None
+
+
+@app.on_event('startup')
+async def startup_event():
+    global ollama_client
+    logging.basicConfig(level=os.getenv('LOG_LEVEL', 'WARNING'))
+    ollama_client = ollama.AsyncClient()
+    faiss.omp_set_num_threads(os.cpu_count() or 1)
+    query_batcher.start()
+    search_batcher.start()
+
+
+@app.on_event('shutdown')
+async def shutdown_event():
+    query_batcher.stop()
+    search_batcher.stop()
 
 
 def ensure_retriever(embed_model: Optional[str] = None) -> HybridRetriever:
@@ -51,52 +78,34 @@ def ensure_retriever(embed_model: Optional[str] = None) -> HybridRetriever:
     return retriever
 
 
+# Consigne fixe : seuls le seuil et les extraits sont insérés à chaque requête
+PROMPT_TEMPLATE = (
+    "Tu es un assistant pédagogique ECE Paris. Réponds exclusivement en français clair et concis.\n"
+    "Utilise UNIQUEMENT les informations présentes dans les extraits ci-dessous.\n"
+    "Chaque affirmation doit être suivie de la citation de la forme [docid:page:index].\n"
+    "Ne crée ni exemples, ni équations, ni explications absents des extraits.\n"
+    "Si tu ne trouves pas la réponse exacte, réponds: \"Information non trouvée dans les sources disponibles.\" (seuil {threshold}).\n\n"
+    "Extraits autorisés:\n{context_block}\n"
+)
+
+
 def build_prompt(retrieved_knowledge, threshold):
-    context_lines = []
-    for chunk, score, meta in retrieved_knowledge:
-        cid = meta.get('chunk_id') or f"{meta.get('doc_id','?')}:{meta.get('page','?')}:{meta.get('chunk_index','?')}"
-        context_lines.append(f"[{cid}] (score {score:.2f}) {chunk}")
-    context_block = '\n'.join(context_lines)
-
-    instruction_prompt = (
-        "Tu es un assistant pédagogique ECE Paris. Réponds exclusivement en français clair et concis.\n"
-        "Utilise UNIQUEMENT les informations présentes dans les extraits ci-dessous.\n"
-        "Chaque affirmation doit être suivie de la citation de la forme [docid:page:index].\n"
-        "Ne crée ni exemples, ni équations, ni explications absents des extraits.\n"
-        f"Si tu ne trouves pas la réponse exacte, réponds: \"Information non trouvée dans les sources disponibles.\" (seuil {threshold}).\n\n"
-        f"Extraits autorisés:\n{context_block}\n"
+    # chunk_id toujours présent : complété au chargement par HybridRetriever
+    context_block = '\n'.join(
+        f"[{meta['chunk_id']}] (score {score:.2f}) {chunk}" for chunk, score, meta in retrieved_knowledge
     )
-    return instruction_prompt
+    return PROMPT_TEMPLATE.format(threshold=threshold, context_block=context_block)
 
 
 @app.get('/api/metadata')
 def get_metadata():
-    retr = ensure_retriever()
-    keys = ['matiere', 'sous_matiere', 'enseignant', 'semestre', 'promo']
-    unique: Dict[str, set] = {k: set() for k in keys}
-    records = []
-    seen = set()
-
-    for doc in retr.documents:
-        meta = doc['metadata']
-        record = {k: meta.get(k) for k in keys}
-        key = tuple(record.get(k) for k in keys)
-        if key not in seen:
-            seen.add(key)
-            records.append(record)
-        for k, val in record.items():
-            if val:
-                unique[k].add(val)
-
-    return {
-        'unique': {k: sorted(v) for k, v in unique.items()},
-        'records': records,
-    }
+    # Calculé une fois par retriever chargé (un nouveau retriever repart d'un cache vide)
+    return ensure_retriever().get_metadata_snapshot()
 
 
 @app.post('/api/ask')
-def ask_question(payload: QueryRequest):
-    retr = ensure_retriever(payload.embed_model)
+async def ask_question(payload: QueryRequest):
+    retr = await asyncio.to_thread(ensure_retriever, payload.embed_model)
 
     metadata_filter = {
         'matiere': payload.matiere,
@@ -107,13 +116,36 @@ def ask_question(payload: QueryRequest):
     }
     metadata_filter = {k: v for k, v in metadata_filter.items() if v}
 
-    retrieved = retr.retrieve(
+    # BM25 (indépendant de l'embedding) calculé dans un thread pendant l'embedding de la question
+    lexical_task = asyncio.create_task(asyncio.to_thread(
+        retr.lexical_search, payload.question, payload.bm25_k, metadata_filter or None
+    ))
+    try:
+        query_vec = await query_batcher.embed(retr.embedding_model, payload.question)
+        vector_hits = None
+        # Requêtes filtrées : recherche individuelle avec sélecteur d'ids (retrieve)
+        if retr.faiss_index.ntotal and not retr.brute_force and not metadata_filter:
+            vector_hits = await search_batcher.search(
+                retr.faiss_index, query_vec, retr.vector_search_k(payload.vector_k)
+            )
+        lexical_hits = await lexical_task
+    finally:
+        # Embedding ou recherche en échec : BM25 abandonné et son éventuelle erreur récupérée
+        # (pas de « Task exception was never retrieved ») ; sans effet une fois la tâche attendue
+        if not lexical_task.done():
+            lexical_task.cancel()
+        lexical_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+    retrieved = await asyncio.to_thread(
+        retr.retrieve,
         payload.question,
         top_n=payload.top_n,
         metadata_filter=metadata_filter or None,
         alpha=payload.alpha,
         vector_k=payload.vector_k,
         bm25_k=payload.bm25_k,
+        query_vec=query_vec,
+        vector_hits=vector_hits,
+        lexical_hits=lexical_hits,
     )
 
     best_vector = 0.0
@@ -135,7 +167,7 @@ def ask_question(payload: QueryRequest):
     prompt = build_prompt(retrieved, payload.threshold)
 
     try:
-        chat = ollama.chat(
+        chat = await ollama_client.chat(
             model=payload.llm_model,
             messages=[
                 {'role': 'system', 'content': prompt},
@@ -160,4 +192,4 @@ def ask_question(payload: QueryRequest):
 
 
 if frontend_dir.exists():
-    app.mount('/', StaticFiles(directory=frontend_dir, html=True), name='frontend')
+    app.mount('/', StaticFiles(directory=str(frontend_dir), html=True), name='frontend')
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Smoke test: concurrent questions on a running RAG API (uvicorn server:app)
+"""
+
+import argparse
+import json
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+QUESTIONS = [
+    "Explique le perceptron",
+    "Qu'est-ce qu'une matrice inverse ?",
+    "Définition d'une application linéaire",
+    "Comment fonctionne la descente de gradient ?",
+]
+
+
+def ask(url: str, payload: dict) -> dict:
+    request = urllib.request.Request(
+        f"{url}/api/ask",
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request, timeout=300) as response:
+        return json.load(response)
+
+
+def test_concurrent_ask(url: str, n: int):
+    print(f"🧪 Testing {n} concurrent /api/ask requests on {url}")
+    print("=" * 50)
+
+    with urllib.request.urlopen(f"{url}/api/metadata", timeout=300) as response:
+        matieres = json.load(response).get("unique", {}).get("matiere", [])
+
+    # Questions avec et sans filtre : BM25 et retrieve tournent dans des threads en même temps
+    payloads = []
+    for i in range(n):
+        payload = {"question": QUESTIONS[i % len(QUESTIONS)]}
+        if i % 2 and matieres:
+            payload["matiere"] = matieres[i % len(matieres)]
+        payloads.append(payload)
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=n) as executor:
+        results = list(executor.map(lambda p: ask(url, p), payloads))
+    elapsed = time.time() - start
+
+    failed = [r for r in results if "answer" not in r]
+    print(f"   Responses: {len(results) - len(failed)}/{n} in {elapsed:.1f}s")
+    if failed:
+        print(f"   ❌ Invalid responses: {failed[:3]}")
+        raise SystemExit(1)
+
+    # Le serveur répond toujours après la rafale
+    ask(url, payloads[0])
+    print("   ✅ Server still answering after the concurrent burst")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent /api/ask smoke test")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL of the RAG API")
+    parser.add_argument("-n", type=int, default=16, help="Number of simultaneous questions")
+    args = parser.parse_args()
+    test_concurrent_ask(args.url.rstrip("/"), args.n)
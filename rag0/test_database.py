@@ -113,15 +113,15 @@ def demonstrate_rag_enhancement():
         print("   Result: More precise, relevant answers!")
         
         # Show the data
-        chunks = db.get_rag_chunks_by_classification()
-        ml_chunks = db.get_rag_chunks_by_classification(matiere="Machine Learning")
-        algebra_chunks = db.get_rag_chunks_by_classification(matiere="Algèbre Linéaire")
+        total_chunks = db.count_rag_chunks()
+        ml_chunks = db.count_rag_chunks(matiere="Machine Learning")
+        algebra_chunks = db.count_rag_chunks(matiere="Algèbre Linéaire")
         
         print(f"\n📊 Your Current Data:")
-        print(f"   Total chunks: {len(chunks)}")
-        print(f"   Machine Learning chunks: {len(ml_chunks)}")
-        print(f"   Algèbre chunks: {len(algebra_chunks)}")
-        print(f"   Precision improvement: {len(ml_chunks)/len(chunks)*100:.1f}% more focused!")
+        print(f"   Total chunks: {total_chunks}")
+        print(f"   Machine Learning chunks: {ml_chunks}")
+        print(f"   Algèbre chunks: {algebra_chunks}")
+        print(f"   Precision improvement: {ml_chunks/total_chunks*100:.1f}% more focused!")
 
 if __name__ == "__main__":
     test_database_functionality()
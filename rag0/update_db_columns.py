@@ -1,23 +1,52 @@
 import sqlite3
 
+from database_manager import INDEX_STATEMENTS
+
 # Chemin vers votre base de données
 db_path = "rag_database.db"
 
-# Connexion à la base
-conn = sqlite3.connect(db_path)
+# Connexion à la base (transactions gérées explicitement : BEGIN ... COMMIT)
+conn = sqlite3.connect(db_path, isolation_level=None)
 cursor = conn.cursor()
+cursor.execute("PRAGMA journal_mode=WAL")
+cursor.execute("PRAGMA synchronous=NORMAL")
+
+# Toute la migration dans une seule transaction : un seul fsync au COMMIT
+cursor.execute("BEGIN IMMEDIATE")
+try:
+    # Vérifier si la colonne existe déjà
+    cursor.execute("PRAGMA table_info(rag_chunks)")
+    columns = [info[1] for info in cursor.fetchall()]
+
+    if "sous_matiere" not in columns:
+        # Ajouter la colonne sous_matiere
+        cursor.execute("ALTER TABLE rag_chunks ADD COLUMN sous_matiere TEXT")
+        print("Colonne 'sous_matiere' ajoutée à rag_chunks.")
+    else:
+        print("La colonne 'sous_matiere' existe déjà.")
 
-# Vérifier si la colonne existe déjà
-cursor.execute("PRAGMA table_info(rag_chunks)")
-columns = [info[1] for info in cursor.fetchall()]
+    # Compléter les chunks sans sous-matière : celle du fichier, sinon la matière (comme ingest_pdf.py)
+    cursor.execute("PRAGMA table_info(files)")
+    if "sous_matiere" in [info[1] for info in cursor.fetchall()]:
+        source = "COALESCE((SELECT f.sous_matiere FROM files f WHERE f.id = rag_chunks.file_id), matiere)"
+    else:
+        source = "matiere"
+    cursor.execute(f"UPDATE rag_chunks SET sous_matiere = {source} WHERE sous_matiere IS NULL")
+    print(f"{cursor.rowcount} chunk(s) complété(s) avec une sous-matière.")
 
-if "sous_matiere" not in columns:
-    # Ajouter la colonne sous_matiere
-    cursor.execute("ALTER TABLE rag_chunks ADD COLUMN sous_matiere TEXT")
-    print("Colonne 'sous_matiere' ajoutée à rag_chunks.")
-else:
-    print("La colonne 'sous_matiere' existe déjà.")
+    # Index des filtres de classification (certains portent sur sous_matiere) + statistiques du planificateur
+    for statement in INDEX_STATEMENTS:
+        try:
+            cursor.execute(statement)
+        except sqlite3.OperationalError as e:
+            print(f"[⚠️] Index skipped ({e})")
+    cursor.execute("ANALYZE")
+    print("Index de classification vérifiés.")
 
-# Sauvegarder et fermer
-conn.commit()
-conn.close()
+    # Sauvegarder
+    cursor.execute("COMMIT")
+except Exception:
+    cursor.execute("ROLLBACK")
+    raise
+finally:
+    conn.close()